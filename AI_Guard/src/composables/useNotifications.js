@@ -1,27 +1,21 @@
 import { ref } from 'vue'
 
 const notifications = ref([])
-let pollingId = null
+let eventSource = null
 
 // Jetson IP - same as video feed
-const JETSON_URL = 'http://192.168.50.26:5500/events'
+// Server-Sent Events: the Jetson pushes new events, no polling needed.
+// On reconnect the browser sends Last-Event-ID, so events in between are not lost.
+const JETSON_EVENTS_URL = 'http://192.168.50.26:5500/events/stream'
 
-const fetchEvents = async () => {
-  try {
-    const res = await fetch(JETSON_URL)
-    const events = await res.json()
-    for (const event of events) {
-      notifications.value.push({
-        id: Date.now() + Math.random(),
-        event_type: event.event_type,
-        description: event.description,
-        camera_id: event.camera_id,
-        timestamp: new Date(event.timestamp * 1000).toISOString()
-      })
-    }
-  } catch (e) {
-    // Jetson unavailable
-  }
+const addNotification = (event) => {
+  notifications.value.push({
+    id: event.seq ?? Date.now() + Math.random(),
+    event_type: event.event_type,
+    description: event.description,
+    camera_id: event.camera_id,
+    timestamp: new Date(event.timestamp * 1000).toISOString()
+  })
 }
 
 const removeNotification = (id) => {
@@ -32,13 +26,22 @@ const removeNotification = (id) => {
 }
 
 const startNotifications = () => {
-  pollingId = setInterval(fetchEvents, 1000)
+  if (eventSource) return
+  eventSource = new EventSource(JETSON_EVENTS_URL)
+  eventSource.addEventListener('event', (message) => {
+    try {
+      addNotification(JSON.parse(message.data))
+    } catch (e) {
+      // Malformed event
+    }
+  })
+  // Jetson unavailable: EventSource keeps retrying on its own
 }
 
 const stopNotifications = () => {
-  if (pollingId) {
-    clearInterval(pollingId)
-    pollingId = null
+  if (eventSource) {
+    eventSource.close()
+    eventSource = null
   }
 }
 
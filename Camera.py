@@ -1,205 +1,195 @@
+import time
+STARTED_AT = time.time()  # before the heavy imports, for the startup timings
+
 import cv2
-import sys
 import argparse
+import itertools
 import os
-import time
-import mediapipe as mp
-from flask import Flask, Response, render_template_string, jsonify
+import json
+from flask import Flask, Response, render_template_string, jsonify, request, send_from_directory, abort
 from flask_cors import CORS
 import threading
-import requests
+from streaming import FrameHub, profile_args
+from pipeline import Pipeline
+from gestures import classify_points, hand_results
+from hands import HandTracker, StubHands
+from sources import open_source, CompressedFrame, FrameSource, capture_time
+from roi import RoiTracker
+from metrics import metrics
+from events import EventLog, parse_cursor
+from status import StatusBoard
+from shipper import EventShipper
+from motion import MotionDetector, InferenceScheduler
+from buffers import FramePool
+from clips import ClipRecorder
+from workers import InferencePool
+from landmarks import LandmarkRecorder
+from asyncserver import AsyncServer
+from supervisor import InferenceGate, Supervisor
+from autotune import AutoTuner
+from tracing import TraceRecorder
 
 app = Flask(__name__)
 CORS(app)
 
 # Configuration - Node.js backend URL
 NODE_BACKEND_URL = os.environ.get('NODE_BACKEND_URL', 'http://localhost:3000')
-
-# Global variables for camera and frame
-camera = None
-current_frame = None
-frame_lock = threading.Lock()
-
-# Events tracking
-events = []
-events_lock = threading.Lock()
+# Events that could not be delivered are spooled here and replayed later
+EVENT_SPOOL_PATH = os.environ.get('EVENT_SPOOL_PATH',
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), 'event_spool.jsonl'))
+# Video clips saved around gesture events
+CLIP_DIR = os.environ.get('CLIP_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clips'))
+# Last camera index that worked, tried first on the next start instead of probing
+CAMERA_CACHE_PATH = os.environ.get('CAMERA_CACHE_PATH',
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), 'camera_cache.json'))
+
+# JPEG quality of the default stream profile (the auto-tuner may lower it)
+STREAM_QUALITY = 60
+
+# Configured cameras by name ('1', '2', ...), each with its own pipeline, stream and status
+cameras = {}
+supervisor = None  # restarts a camera's pipeline after its source fails
+inference_gate = InferenceGate()  # shares the inference CPU fairly between the cameras
+auto_tuner = None  # AutoTuner with --auto-tune
+tracer = None  # TraceRecorder with --trace
+# Frame IDs are shared by all cameras, so an ID names one frame even across pipeline restarts
+frame_ids = itertools.count(1)
+# USB probing runs one camera at a time, so two cameras never claim the same device
+usb_lock = threading.Lock()
+usb_claimed = {}  # camera index -> name of the camera using it
+
+# Events tracking: bounded log with sequence numbers, readers keep their own cursor (shared by all cameras)
+event_log = EventLog(maxlen=1000)
+
+# One long-lived shipper: pooled connection, batching, retry and disk spool
+event_shipper = EventShipper(NODE_BACKEND_URL, EVENT_SPOOL_PATH)
 
 
 def send_event_to_backend(event_data):
-    """Send event to Node.js backend asynchronously"""
+    """Queue event for the Node.js backend (never blocks camera processing)"""
+    event_shipper.submit(event_data)
+
+def initial_status(camera_id):
+    """Status fields of a camera before its first frame"""
+    return {
+        'camera_id': camera_id,
+        'camera': {},  # source, supervisor state and restarts
+        'gesture': None,  # 'rock', 'paper', 'scissors', 'middle_finger', or None
+        'rock_detected': False,
+        'paper_detected': False,
+        'scissors_detected': False,
+        'middle_finger_detected': False,
+        'label': '',
+        'frame_count': 0,
+        'fps': 0.0,
+        'timestamp': 0.0,
+        'pipeline': {},  # per-stage frame and drop counters
+        'shipper': {},  # event queue depth, batch size and send latency
+        'motion': {},  # motion gate state and inference-skip counters
+        'roi': {},  # ROI hit/miss counters and per-inference cost (with --roi)
+        'buffers': {},  # frame pool allocations, reuse and buffers in use
+        'clips': {},  # clip ring buffer size and clips written / rate limited
+        'hands': [],  # every tracked hand: id, handedness, gesture
+        'hand_tracking': {},  # tracked hands and inference cost by number of hands
+        'workers': {},  # inference worker processes (with --workers)
+        'inference_gate': {},  # turns and wait for the shared inference CPU
+        'tuning': {},  # auto-tuner budget, last sample and current settings (with --auto-tune)
+        'trace': {},  # spans buffered for /api/trace (with --trace)
+        'ready': False,  # True once the first frame went through
+        'startup': {}  # camera_open_seconds, model_load_seconds, time_to_first_frame
+    }
+
+
+class CameraFeed:
+    """One configured camera and everything that outlives a restart of its pipeline"""
+
+    def __init__(self, name, source, index):
+        self.name = name
+        self.camera_id = f"Camera {name}"
+        self.source = source
+        self.index = index
+        self.camera = None
+        self.pipeline = None  # Pipeline of the current run
+        self.runs = 0
+        # Limit stream to 15 FPS and JPEG quality 60 for smoother playback
+        self.stream_hub = FrameHub(quality=STREAM_QUALITY, max_fps=15)
+        # Reusable frame buffers: the camera reads into them instead of allocating every frame
+        self.frame_pool = FramePool(size=8)
+        # Status is published as immutable snapshots, readers never take a lock
+        self.status_board = StatusBoard(initial_status(self.camera_id))
+        self.clip_recorder = None  # ClipRecorder unless --no-clips
+        self.landmark_recorder = None  # LandmarkRecorder with --record-landmarks
+
+
+def default_camera():
+    """The first configured camera, served by the routes without a camera name"""
+    return next(iter(cameras.values()))
+
+
+def get_camera(name):
+    cam = cameras.get(name)
+    if cam is None:
+        abort(404)
+    return cam
+
+
+def gesture_latency():
+    """Capture -> gesture seconds of the slowest camera, None before the first inference"""
+    latencies = [cam.pipeline.last_latency for cam in cameras.values()
+                 if cam.pipeline and cam.pipeline.frames_inferred]
+    return max(latencies) if latencies else None
+
+
+def apply_tuning(settings):
+    """Push auto-tuner settings to every camera, the inference width is read per frame"""
+    for cam in cameras.values():
+        cam.stream_hub.set_quality(settings['stream_quality'])
+        if cam.pipeline:
+            cam.pipeline.infer_interval = settings['infer_interval']
+
+
+def camera_info(cam):
+    """Source and supervisor state of one camera"""
+    info = {'id': cam.name, 'camera_id': cam.camera_id, 'source': cam.source}
+    if supervisor:
+        info.update(supervisor.stats(cam.name))
+    return info
+
+
+def gesture_status(gesture, label, seen=None):
+    """Status fields describing the current gesture, the *_detected flags cover every hand in seen"""
+    seen = seen if seen is not None else {gesture}
+    return {
+        'gesture': gesture,
+        'rock_detected': 'rock' in seen,
+        'paper_detected': 'paper' in seen,
+        'scissors_detected': 'scissors' in seen,
+        'middle_finger_detected': 'middle_finger' in seen,
+        'label': label
+    }
+
+
+def hand_list(hands):
+    """Per-hand state as a JSON-friendly list ordered by hand ID"""
+    return [{'id': hand_id, 'handedness': hand['handedness'], 'gesture': hand['gesture']}
+            for hand_id, hand in sorted(hands.items())]
+
+
+def status_response(cam, view, build):
+    """JSON response for a view of a camera's current status snapshot, 304 if the client's ETag matches"""
+    body, etag = cam.status_board.current.render(view, build)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-    def send():
-        try:
-            response = requests.post(
-                f'{NODE_BACKEND_URL}/api/log',
-                json=event_data,
-                timeout=2  # 2 second timeout
-            )
-            if response.status_code == 200:
-                print(f"Event sent to backend: {event_data['event_type']}")
-            else:
-                print(f"Backend responded with status {response.status_code}")
-        except requests.exceptions.RequestException as e:
-            print(f"Failed to send event to backend: {e}")
-
-    # Send in background thread to not block camera processing
-    thread = threading.Thread(target=send, daemon=True)
-    thread.start()
-
-api_data = {
-    'gesture': None,  # 'rock', 'paper', 'scissors', 'middle_finger', or None
-    'rock_detected': False,
-    'paper_detected': False,
-    'scissors_detected': False,
-    'middle_finger_detected': False,
-    'label': '',
-    'frame_count': 0,
-    'fps': 0.0,
-    'timestamp': 0.0
-}
-api_data_lock = threading.Lock()
-
-def open_usb(index, width, height, fps):
-    cap = cv2.VideoCapture(index, cv2.CAP_V4L2)
-    if not cap.isOpened():
-        return None
-    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-    cap.set(cv2.CAP_PROP_FPS, fps)
-    ok, _ = cap.read()
-    if not ok:
-        cap.release()
-        return None
-    return cap
-
-def is_finger_extended(landmarks, tip_idx, pip_idx, h, threshold=0):
-    """Check if a finger is extended (tip above pip with optional threshold)"""
-    tip_y = landmarks[tip_idx].y * h
-    pip_y = landmarks[pip_idx].y * h
-    return tip_y < (pip_y + threshold)
-
-def get_finger_curl(landmarks, tip_idx, pip_idx, mcp_idx, h):
-    """Get how much a finger is curled (higher = more curled)"""
-    tip_y = landmarks[tip_idx].y * h
-    pip_y = landmarks[pip_idx].y * h
-    mcp_y = landmarks[mcp_idx].y * h
-    # Return relative position of tip compared to pip-mcp range
-    return (tip_y - pip_y) / max(abs(mcp_y - pip_y), 1)
-
-def is_fist(landmarks, h, w):
-    """Rock: All 4 fingers folded (fist)"""
-    tips = [8, 12, 16, 20]
-    pips = [6, 10, 14, 18]
-    folded = 0
-    for t, p in zip(tips, pips):
-        tip_y = landmarks[t].y * h
-        pip_y = landmarks[p].y * h
-        # Add small threshold - tip just needs to be near or below pip
-        if tip_y > pip_y - (h * 0.02):
-            folded += 1
-    return folded == 4  # All 4 fingers must be folded
-
-def is_scissors(landmarks, h, w):
-    """Scissors: Index and middle finger clearly extended, ring and pinky clearly folded"""
-    # Finger landmarks: tip, dip, pip, mcp
-    # Index: 8, 7, 6, 5
-    # Middle: 12, 11, 10, 9
-    # Ring: 16, 15, 14, 13
-    # Pinky: 20, 19, 18, 17
-    
-    # Get curl values for all fingers
-    index_curl = get_finger_curl(landmarks, 8, 6, 5, h)
-    middle_curl = get_finger_curl(landmarks, 12, 10, 9, h)
-    ring_curl = get_finger_curl(landmarks, 16, 14, 13, h)
-    pinky_curl = get_finger_curl(landmarks, 20, 18, 17, h)
-    
-    # Index and middle must be clearly extended (negative curl or near zero)
-    index_extended = index_curl < 0.3
-    middle_extended = middle_curl < 0.3
-    
-    # Ring and pinky must be clearly MORE folded than index/middle
-    ring_folded = ring_curl > 0.5
-    pinky_folded = pinky_curl > 0.4
-    
-    # Both index and middle extended, AND both ring and pinky folded
-    return index_extended and middle_extended and ring_folded and pinky_folded
-
-def is_middle_finger(landmarks, h, w):
-    """Middle finger: Only middle finger extended, all others folded"""
-    # Get curl values for all fingers
-    index_curl = get_finger_curl(landmarks, 8, 6, 5, h)
-    middle_curl = get_finger_curl(landmarks, 12, 10, 9, h)
-    ring_curl = get_finger_curl(landmarks, 16, 14, 13, h)
-    pinky_curl = get_finger_curl(landmarks, 20, 18, 17, h)
-    
-    # Middle finger must be extended
-    middle_extended = middle_curl < 0.6
-    
-    # Other fingers should be more curled than middle (at least 2 of them)
-    fingers_more_folded = 0
-    if index_curl > middle_curl + 0.1:
-        fingers_more_folded += 1
-    if ring_curl > middle_curl + 0.1:
-        fingers_more_folded += 1
-    if pinky_curl > middle_curl + 0.1:
-        fingers_more_folded += 1
-    
-    # At least 2 other fingers should be more folded than middle
-    return middle_extended and fingers_more_folded >= 2
-
-def is_paper(landmarks, h, w):
-    """Paper: All 4 fingers clearly extended (open hand)"""
-    tips = [8, 12, 16, 20]
-    pips = [6, 10, 14, 18]
-    mcps = [5, 9, 13, 17]
-    extended = 0
-    for t, p, m in zip(tips, pips, mcps):
-        curl = get_finger_curl(landmarks, t, p, m, h)
-        # Finger must be clearly extended (low curl value)
-        if curl < 0.3:
-            extended += 1
-    return extended == 4  # All 4 fingers must be extended
-
-def detect_gesture(landmarks, h, w):
-    """Detect rock, paper, scissors, or middle finger gesture"""
-    # Check middle finger FIRST (before fist, since fist would match 3 folded fingers)
-    if is_middle_finger(landmarks, h, w):
-        return 'middle_finger', 'MIDDLE FINGER'
-    elif is_fist(landmarks, h, w):
-        return 'rock', 'ROCK (FIST)'
-    elif is_scissors(landmarks, h, w):
-        return 'scissors', 'SCISSORS (PEACE)'
-    elif is_paper(landmarks, h, w):
-        return 'paper', 'PAPER (OPEN HAND)'
-    return None, ''
-
-def generate_frames():
+def generate_frames(cam, width=None, quality=None, max_fps=None):
     """Generator function to yield video frames for streaming"""
-    global current_frame, frame_lock
-    last_time = time.time()
-    target_fps = 15  # Limit stream to 15 FPS for smoother playback
-    
-    while True:
-        # Rate limiting to prevent overwhelming the network
-        current_time = time.time()
-        elapsed = current_time - last_time
-        if elapsed < 1.0 / target_fps:
-            time.sleep(1.0 / target_fps - elapsed)
-        last_time = time.time()
-        
-        with frame_lock:
-            if current_frame is None:
-                continue
-            # Encode frame as JPEG with lower quality for better performance
-            ret, buffer = cv2.imencode('.jpg', current_frame, [cv2.IMWRITE_JPEG_QUALITY, 60])
-            if not ret:
-                continue
-            frame_bytes = buffer.tobytes()
-        
-        # Yield frame in multipart format
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    # Frames are encoded once per profile by the hub, not once per client
+    return cam.stream_hub.stream(width, quality, max_fps)
 
 @app.route('/')
 def index():
@@ -231,214 +221,620 @@ def index():
     </head>
     <body>
         <h1>Jetson Nano Camera Stream</h1>
-        <img src="{{ url_for('video_feed') }}" alt="Video Stream">
+        {% for cam in cameras %}
+        {% if cameras|length > 1 %}<h2>{{ cam.camera_id }}</h2>{% endif %}
+        <img src="{{ url_for('camera_feed', name=cam.name) }}" alt="Video Stream">
+        {% endfor %}
     </body>
     </html>
     """
-    return render_template_string(html)
+    return render_template_string(html, cameras=list(cameras.values()))
 
 @app.route('/api/status')
 def api_status():
-    """API endpoint to get current status"""
-    global api_data, api_data_lock
-    with api_data_lock:
-        return jsonify(api_data)
+    """API endpoint to get current status (first camera)"""
+    return status_response(default_camera(), 'status', dict)
+
+@app.route('/api/status/<name>')
+def camera_status(name):
+    """Current status of one camera"""
+    return status_response(get_camera(name), 'status', dict)
+
+def camera_list():
+    """Every configured camera with its supervisor state, readiness and frame rate"""
+    return [dict(camera_info(cam), ready=cam.status_board.current.data['ready'],
+                 fps=round(cam.status_board.current.data['fps'], 2))
+            for cam in cameras.values()]
+
+@app.route('/api/tuning', methods=['GET', 'POST'])
+def api_tuning():
+    """Auto-tuner state, POST {"cpu_percent", "latency_ms", "enabled"} changes the budget at runtime"""
+    if auto_tuner is None:
+        return jsonify({'error': 'auto-tuning is off, start with --auto-tune'}), 404
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            auto_tuner.set_budget(data.get('cpu_percent'), data.get('latency_ms'), data.get('enabled'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify(auto_tuner.stats())
+
+@app.route('/api/trace')
+def api_trace():
+    """Per-frame stage timings as Chrome trace-event JSON (chrome://tracing, Perfetto), ?frame_id= for one frame"""
+    if tracer is None:
+        return jsonify({'error': 'tracing is off, start with --trace N'}), 404
+    response = jsonify(tracer.export(parse_cursor(request.args.get('frame_id'))))
+    response.headers['Content-Disposition'] = 'attachment; filename=trace.json'
+    return response
+
+@app.route('/api/trace/summary')
+def api_trace_summary():
+    """Count, mean and p50 / p99 ms per stage over the buffered spans"""
+    if tracer is None:
+        return jsonify({'error': 'tracing is off, start with --trace N'}), 404
+    return jsonify(tracer.summary())
+
+@app.route('/api/cameras')
+def api_cameras():
+    """API endpoint listing the cameras"""
+    return jsonify(camera_list())
+
+def ready_data():
+    """Ready once every camera has captured a frame"""
+    ready = {name: cam.status_board.current.data['ready'] for name, cam in cameras.items()}
+    return all(ready.values()), {'ready': all(ready.values()), 'cameras': ready,
+                                 'startup': default_camera().status_board.current.data['startup']}
+
+@app.route('/api/ready')
+def api_ready():
+    """Readiness check: 503 until the first frame has been captured"""
+    ready, data = ready_data()
+    return jsonify(data), 200 if ready else 503
+
+def fist_view(data):
+    return {
+        'fist_detected': data['rock_detected'],
+        'label': data['label']
+    }
+
+def gesture_view(data):
+    return {
+        'gesture': data['gesture'],
+        'rock_detected': data['rock_detected'],
+        'paper_detected': data['paper_detected'],
+        'scissors_detected': data['scissors_detected'],
+        'middle_finger_detected': data['middle_finger_detected'],
+        'label': data['label'],
+        'hands': data['hands']
+    }
 
 @app.route('/api/fist')
 def api_fist():
     """API endpoint to check if fist is detected (legacy)"""
-    global api_data, api_data_lock
-    with api_data_lock:
-        return jsonify({
-            'fist_detected': api_data['rock_detected'],
-            'label': api_data['label']
-        })
+    return status_response(default_camera(), 'fist', fist_view)
 
 @app.route('/api/gesture')
 def api_gesture():
     """API endpoint to check current gesture (rock/paper/scissors/middle_finger)"""
-    global api_data, api_data_lock
-    with api_data_lock:
-        return jsonify({
-            'gesture': api_data['gesture'],
-            'rock_detected': api_data['rock_detected'],
-            'paper_detected': api_data['paper_detected'],
-            'scissors_detected': api_data['scissors_detected'],
-            'middle_finger_detected': api_data['middle_finger_detected'],
-            'label': api_data['label']
-        })
+    return status_response(default_camera(), 'gesture', gesture_view)
 
 @app.route('/events')
 def get_events():
-    """API endpoint to get and clear events"""
-    global events, events_lock
-    with events_lock:
-        result = list(events)
-        events.clear()
-    return jsonify(result)
+    """API endpoint to get events after ?since=<seq> (all buffered events without it)"""
+    since = parse_cursor(request.args.get('since'))
+    result = [dict(data, seq=seq) for seq, _, data in event_log.since(since or 0, kind='event')]
+    response = jsonify(result)
+    response.headers['X-Last-Seq'] = str(event_log.last_seq)
+    return response
+
+@app.route('/events/stream')
+def stream_events():
+    """Server-Sent Events push of events and gesture changes"""
+    # EventSource sends Last-Event-ID when it reconnects, so nothing is lost in between
+    since = parse_cursor(request.headers.get('Last-Event-ID'))
+    if since is None:
+        since = parse_cursor(request.args.get('since'))
+    return Response(event_log.stream(since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/clips/<path:name>')
+def get_clip(name):
+    """Download a saved event clip (motion JPEG)"""
+    return send_from_directory(CLIP_DIR, name, mimetype='video/x-motion-jpeg')
+
+@app.route('/metrics')
+def get_metrics():
+    """Per-stage latency histograms and frame counters in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/video_feed')
 def video_feed():
-    """Video streaming route"""
-    return Response(generate_frames(),
+    """Video streaming route (first camera), optional ?width=&quality=&fps= select a smaller / cheaper profile"""
+    return Response(generate_frames(default_camera(), **profile_args(request.args)),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/video_feed/<name>')
+def camera_feed(name):
+    """Video stream of one camera, same options as /video_feed"""
+    return Response(generate_frames(get_camera(name), **profile_args(request.args)),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
-def camera_thread(args):
-    """Thread to capture and process camera frames"""
-    global camera, current_frame, frame_lock
+def async_routes():
+    """Status routes for --async-server, same bodies and ETags as the Flask ones"""
+    def snapshot(cam, view, build):
+        return lambda query: (200,) + cam.status_board.current.render(view, build)
+
+    def ready(query):
+        ok, data = ready_data()
+        return 200 if ok else 503, json.dumps(data).encode(), None
+
+    def tuning(query):
+        # Read only here, budget changes go through the Flask POST route
+        if auto_tuner is None:
+            return 404, b'{"error": "auto-tuning is off, start with --auto-tune"}', None
+        return 200, json.dumps(auto_tuner.stats()).encode(), None
+
+    def trace(query):
+        if tracer is None:
+            return 404, b'{"error": "tracing is off, start with --trace N"}', None
+        return 200, json.dumps(tracer.export(parse_cursor(query.get('frame_id')))).encode(), None
+
+    def trace_summary(query):
+        if tracer is None:
+            return 404, b'{"error": "tracing is off, start with --trace N"}', None
+        return 200, json.dumps(tracer.summary()).encode(), None
+
+    cam = default_camera()
+    routes = {
+        '/api/status': snapshot(cam, 'status', dict),
+        '/api/fist': snapshot(cam, 'fist', fist_view),
+        '/api/gesture': snapshot(cam, 'gesture', gesture_view),
+        '/api/ready': ready,
+        '/api/cameras': lambda query: (200, json.dumps(camera_list()).encode(), None),
+        '/api/tuning': tuning,
+        '/api/trace': trace,
+        '/api/trace/summary': trace_summary,
+    }
+    for name, cam in cameras.items():
+        routes[f'/api/status/{name}'] = snapshot(cam, 'status', dict)
+    return routes
+
+def run_camera(cam, args):
+    """Capture and process one camera's frames until its source stops.
+
+    Returns True when the camera is done for good (an offline source
+    reached its end), False when the supervisor should restart it.
+    """
+    run_start = STARTED_AT if cam.runs == 0 else time.time()
+    cam.runs += 1
+    cam.status_board.update(ready=False)
+
+    # MediaPipe takes seconds to import and set up, so it loads while the camera opens
+    model = {}
 
-    # Open USB cam
-    if args.index >= 0:
-        camera = open_usb(args.index, args.width, args.height, args.fps)
+    def load_model():
+        try:
+            create_model()
+        except Exception as e:
+            model['error'] = e
+
+    def create_model():
+        load_start = time.time()
+        if args.workers:
+            # Each worker process loads its own MediaPipe, landmarks come back to handle_hands
+            # (set up with the pipeline, results only arrive once it submits frames)
+            model['pool'] = InferencePool(args.workers, lambda *result: model['on_result'](*result),
+                                          {'max_hands': args.max_hands, 'detector': args.detector,
+                                           'stub_delay': args.stub_delay}).start()
+            model['roi'] = model['hands'] = None
+            # Loaded once every worker has its model up, like the in-process path
+            if not model['pool'].wait_started():
+                print("Inference workers still loading, starting without them")
+            model['seconds'] = time.time() - load_start
+            return
+        model['pool'] = None
+        if args.detector == 'stub':
+            model['roi'], model['hands'] = None, StubHands(args.stub_delay)
+            model['seconds'] = time.time() - load_start
+            return
+        import mediapipe as mp
+        mp_hands = mp.solutions.hands
+
+        def make_hands():
+            return mp_hands.Hands(model_complexity=0, max_num_hands=args.max_hands,
+                                  min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+        # ROI mode runs MediaPipe on a small crop around the last hand instead of the full frame
+        model['roi'] = RoiTracker(make_hands, args.roi_size, args.roi_expand, args.search_width) if args.roi else None
+        model['hands'] = None if model['roi'] else make_hands()
+        model['seconds'] = time.time() - load_start
+
+    loader = threading.Thread(target=load_model, daemon=True)
+    loader.start()
+
+    # Open USB cam (or an offline source for replay / profiling)
+    with usb_lock:
+        camera = cam.camera = open_source(
+            cam.source, cam.index, args.width, args.height, args.fps,
+            pace=args.pace, loop=args.loop, max_frames=args.max_frames, passthrough=args.passthrough,
+            cache_path=CAMERA_CACHE_PATH if cam.name == '1' else None, claimed=usb_claimed, owner=cam.name)
+    loader.join()
+    inference_pool = model.get('pool')
+    try:
         if camera is None:
-            print(f"Error: Failed to open camera {args.index}")
-            sys.exit(1)
+            # A file that cannot be opened will not open on a retry either
+            return not cam.source.startswith('usb')
+        if 'error' in model:
+            raise model['error']
+        return run_pipeline(cam, args, camera, model, run_start)
+    finally:
+        if inference_pool:
+            inference_pool.close()
+        if camera is not None:
+            camera.release()
+            cam.camera = None
+        if cam.source == 'usb' and cam.index < 0:
+            # A probed device is free again, the restart probes anew
+            with usb_lock:
+                for i in [i for i, owner in usb_claimed.items() if owner == cam.name]:
+                    del usb_claimed[i]
+
+
+def run_pipeline(cam, args, camera, model, run_start):
+    """Capture, inference and publish stages for one opened camera"""
+    camera_open_seconds = time.time() - run_start
+    print(f"{cam.camera_id} open after {camera_open_seconds:.2f}s")
+    roi, hands, inference_pool = model['roi'], model['hands'], model['pool']
+    if inference_pool:
+        print(f"Started {args.workers} inference worker processes in {model['seconds']:.2f}s")
     else:
-        camera = None
-        for i in [0, 1, 2, 3]:
-            print(f"Trying camera index {i}...")
-            camera = open_usb(i, args.width, args.height, args.fps)
-            if camera:
-                print(f"Opened camera {i}")
-                break
-        if camera is None:
-            print("Error: Could not open any USB camera.")
-            sys.exit(1)
-
-    mp_hands = mp.solutions.hands
-    hands = mp_hands.Hands(model_complexity=0, max_num_hands=1,
-                           min_detection_confidence=0.5, min_tracking_confidence=0.5)
-    
-    current_gesture = None  # 'rock', 'paper', 'scissors', or None
+        print(f"MediaPipe loaded in {model['seconds']:.2f}s")
+    frame_pool, status_board, stream_hub = cam.frame_pool, cam.status_board, cam.stream_hub
+    clip_recorder, landmark_recorder = cam.clip_recorder, cam.landmark_recorder
+    trace = tracer.tracer(cam.camera_id) if tracer else None
+
+    # Shared between the stages, only the inference stage writes it
+    state = {
+        'gesture': None,  # 'rock', 'paper', 'scissors', 'middle_finger', or None (primary hand)
+        'label': '',
+        'hands': {}  # hand id -> {'gesture', 'label', 'handedness'}
+    }
+    hand_tracker = HandTracker()
+    if landmark_recorder:
+        landmark_recorder.start_run()  # hand IDs start over with this tracker
     frame_count = 0
-    last_label = ""
     fps_counter = 0
     fps_start_time = time.time()
-    last_process_time = 0  # Track when we last processed MediaPipe
+    rgb_buffer = None  # reused by cvtColor, only the inference stage touches it
 
-    while True:
-        ok, frame = camera.read()
-        if not ok:
-            print("Failed to read frame")
-            break
+    # Motion decides when MediaPipe runs, unless the fixed --process-interval timer was asked for
+    if args.no_motion_gate:
+        motion_detector = scheduler = None
+    else:
+        motion_detector = MotionDetector(args.motion_width, args.motion_pixel_threshold, args.motion_threshold)
+        scheduler = InferenceScheduler(args.idle_interval, args.active_interval, args.motion_hold)
 
+    def read_frame():
+        """Capture stage: runs at camera rate and never waits for inference"""
+        nonlocal frame_count, fps_counter, fps_start_time
+        ok, frame = frame_pool.read(camera)
+        if not ok:
+            return ok, frame
+
+        if frame_count == 0:
+            first_frame = time.time() - run_start
+            print(f"{cam.camera_id}: first frame after {first_frame:.2f}s")
+            status_board.update(ready=True, startup={
+                'camera_open_seconds': round(camera_open_seconds, 3),
+                'model_load_seconds': round(model['seconds'], 3),
+                'time_to_first_frame': round(first_frame, 3)
+            })
         frame_count += 1
         fps_counter += 1
-        
         if fps_counter >= args.fps:
             elapsed = time.time() - fps_start_time
             current_fps = fps_counter / elapsed if elapsed > 0 else 0
             fps_counter = 0
             fps_start_time = time.time()
-            
-            # Update API data
-            with api_data_lock:
-                api_data['gesture'] = current_gesture
-                api_data['rock_detected'] = current_gesture == 'rock'
-                api_data['paper_detected'] = current_gesture == 'paper'
-                api_data['scissors_detected'] = current_gesture == 'scissors'
-                api_data['middle_finger_detected'] = current_gesture == 'middle_finger'
-                api_data['label'] = label if 'label' in locals() else last_label
-                api_data['frame_count'] = frame_count
-                api_data['fps'] = current_fps
-                api_data['timestamp'] = time.time()
-        # Only process MediaPipe every N seconds to reduce CPU load
-        current_time = time.time()
-        if current_time - last_process_time >= args.process_interval:
-            last_process_time = current_time
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            res = hands.process(rgb)
-            h, w = frame.shape[:2]
-
-            label = ""
-            detected_gesture = None
-            if res.multi_hand_landmarks:
-                lms = res.multi_hand_landmarks[0].landmark
-                detected_gesture, label = detect_gesture(lms, h, w)
-                
-                # Log event if gesture changed
-                if detected_gesture and detected_gesture != current_gesture:
-                    gesture_names = {
-                        'rock': ('ROCK', 'Fist gesture detected'),
-                        'paper': ('PAPER', 'Open hand gesture detected'),
-                        'scissors': ('SCISSORS', 'Peace sign gesture detected'),
-                        'middle_finger': ('MIDDLE FINGER', 'Middle finger gesture detected')
-                    }
-                    name, desc = gesture_names[detected_gesture]
-                    print(f"{name} detected")
-
-                    event_data = {
-                        "event_type": f"{name} Detected",
-                        "description": desc,
-                        "camera_id": "Camera 1",
-                        "timestamp": time.time()
-                    }
-
-                    # Store locally (for /events endpoint)
-                    with events_lock:
-                        events.append(event_data)
-
-                    # Send to Node.js backend
-                    send_event_to_backend(event_data)
-                
-                current_gesture = detected_gesture
-            else:
-                current_gesture = None
-            
-            last_label = label
-            with api_data_lock:
-                api_data['gesture'] = current_gesture
-                api_data['rock_detected'] = current_gesture == 'rock'
-                api_data['paper_detected'] = current_gesture == 'paper'
-                api_data['scissors_detected'] = current_gesture == 'scissors'
-                api_data['middle_finger_detected'] = current_gesture == 'middle_finger'
-                api_data['label'] = label
-                api_data['frame_count'] = frame_count
-                api_data['timestamp'] = time.time()
-        else:
-            # Use previous label to maintain continuity
-            label = last_label
-
-            with api_data_lock:
-                api_data['gesture'] = current_gesture
-                api_data['rock_detected'] = current_gesture == 'rock'
-                api_data['paper_detected'] = current_gesture == 'paper'
-                api_data['scissors_detected'] = current_gesture == 'scissors'
-                api_data['middle_finger_detected'] = current_gesture == 'middle_finger'
-                api_data['label'] = label
-                api_data['frame_count'] = frame_count
 
-        # Draw label on frame
-        if label:
-            cv2.putText(frame, label, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
-
-        # Update current frame for streaming (only update every other frame to reduce lock contention)
-        with frame_lock:
-            if frame_count % 2 == 0:  # Update every other frame
-                current_frame = frame.copy()
+            # Counters change every frame, so they are only published once per second
+            status_board.update(
+                fps=current_fps,
+                frame_count=frame_count,
+                pipeline=pipeline.stats(),
+                buffers=frame_pool.stats(),
+                clips=clip_recorder.stats() if clip_recorder else {},
+                hand_tracking=hand_tracker.stats(),
+                workers=inference_pool.stats() if inference_pool else {},
+                inference_gate=inference_gate.stats(cam.name),
+                tuning=auto_tuner.stats() if auto_tuner else {},
+                trace=tracer.stats() if tracer else {},
+                shipper=event_shipper.stats(),
+                roi=roi.stats() if roi else {},
+                motion=dict(scheduler.stats(), level=round(motion_detector.level, 4)) if scheduler else {}
+            )
 
-    camera.release()
+        return ok, frame
+
+    def infer(frame_id, frame):
+        """Inference stage: always gets the freshest frame, runs MediaPipe when motion calls for it"""
+        nonlocal rgb_buffer
+        compressed = isinstance(frame, CompressedFrame)
+        if scheduler:
+            # A passthrough frame only needs a reduced grayscale decode for the motion check
+            motion_input = frame.decode(cv2.IMREAD_REDUCED_GRAYSCALE_4) if compressed else frame
+            if not scheduler.should_run(time.time(), motion_detector.update(motion_input)):
+                return False
+
+        if compressed:
+            with metrics.timer('imdecode'):
+                frame = frame.decode()
+
+        if inference_pool:
+            # Worker processes do the rest, results come back through handle_hands in frame order
+            return inference_pool.submit(frame_id, frame)
+
+        # Cameras take turns on the CPU, the one that has used the least goes first
+        with inference_gate.turn(cam.name):
+            # The auto-tuner may shrink the inference input (ROI mode picks its own crop size)
+            infer_width = auto_tuner.settings['infer_width'] if auto_tuner and not roi else None
+            small = frame
+            if infer_width and frame.shape[1] > infer_width:
+                # Landmarks are normalized, a smaller input only costs precision
+                with metrics.timer('infer_resize'):
+                    small = cv2.resize(frame, (infer_width, frame.shape[0] * infer_width // frame.shape[1]),
+                                       interpolation=cv2.INTER_AREA)
+            with metrics.timer('cvt_color'):
+                rgb = rgb_buffer = cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=rgb_buffer)
+            infer_start = time.perf_counter()
+            with metrics.timer('hands_process'):
+                res = roi.process(rgb) if roi else hands.process(rgb)
+            infer_seconds = time.perf_counter() - infer_start
+        points, handedness = hand_results(res)
+        handle_hands(frame_id, points, handedness, frame.shape, infer_seconds)
+
+    def handle_hands(frame_id, points, handedness, shape, seconds):
+        """Gesture state tracking for the hands found in one frame"""
+        h = shape[0]
+        classify_start = time.time()
+        with metrics.timer('detect_gesture'):
+            # All hands are classified in one batched call
+            results = classify_points(points, h)
+        now = time.time()
+        if trace:
+            trace(frame_id, 'classify', classify_start, now)
+        # Events carry the frame they were seen in and when the camera captured it
+        captured_at = pipeline.captured_at(frame_id) or now
+        hand_ids, expired = hand_tracker.update(points, handedness, now)
+        hand_tracker.record_cost(len(points), seconds)
+        if landmark_recorder:
+            landmark_recorder.record(frame_id, captured_at, hand_ids, points, shape)
+
+        previous = state['hands']
+        current = {}
+        clip = None  # one clip per frame, shared by every event seen in it ('' when rate limited)
+        for hand_id, hand, (detected_gesture, label) in zip(hand_ids, handedness, results):
+            current[hand_id] = {'gesture': detected_gesture, 'label': label, 'handedness': hand}
+
+            # Log event if this hand's gesture changed
+            if detected_gesture and detected_gesture != previous.get(hand_id, {}).get('gesture'):
+                gesture_names = {
+                    'rock': ('ROCK', 'Fist gesture detected'),
+                    'paper': ('PAPER', 'Open hand gesture detected'),
+                    'scissors': ('SCISSORS', 'Peace sign gesture detected'),
+                    'middle_finger': ('MIDDLE FINGER', 'Middle finger gesture detected')
+                }
+                name, desc = gesture_names[detected_gesture]
+                print(f"{name} detected ({cam.camera_id}, hand {hand_id})")
+
+                event_data = {
+                    "event_type": f"{name} Detected",
+                    "description": desc,
+                    "camera_id": cam.camera_id,
+                    "hand_id": hand_id,
+                    "handedness": hand,
+                    "frame_id": frame_id,
+                    "captured_at": captured_at,
+                    "timestamp": now
+                }
+                # Seconds of video before and after the event, written in the background
+                if clip_recorder and clip is None:
+                    clip = clip_recorder.trigger(now) or ''
+                if clip:
+                    event_data["clip"] = clip
+
+                # Store locally (for /events endpoints)
+                event_log.append(event_data)
+                if trace:
+                    trace(frame_id, 'event', captured_at, time.time())
+
+                # Send to Node.js backend
+                send_event_to_backend(event_data)
+
+        # Hands that are out of view keep their state until the tracker forgets them
+        for hand_id, hand_state in previous.items():
+            if hand_id not in current and hand_id not in expired:
+                current[hand_id] = dict(hand_state, gesture=None, label='')
+
+        # The lowest ID (the hand seen longest) drives the single-gesture fields
+        primary = current[min(current)] if current else {'gesture': None, 'label': ''}
+        labels = [f"#{hand_id} {hand_state['label']}" for hand_id, hand_state in sorted(current.items())
+                  if hand_state['label']]
+        label = primary['label'] if len(current) <= 1 else ' | '.join(labels)
+
+        if label != state['label'] or primary['gesture'] != state['gesture']:
+            # Let dashboards update the gesture label without polling /api/gesture
+            event_log.append({
+                "gesture": primary['gesture'],
+                "label": label,
+                "hands": hand_list(current),
+                "camera_id": cam.camera_id,
+                "frame_id": frame_id,
+                "captured_at": captured_at,
+                "timestamp": now
+            }, kind='gesture')
+        state['hands'] = current
+        state['gesture'] = primary['gesture']
+        state['label'] = label
+        # No-op unless the gesture or label changed
+        seen = {hand_state['gesture'] for hand_state in current.values()}
+        status_board.update(hands=hand_list(current), **gesture_status(primary['gesture'], label, seen))
+
+    def on_result(frame_id, *result):
+        # Worker results: inference of the frame only counts as done once they are handled
+        try:
+            handle_hands(frame_id, *result)
+        finally:
+            pipeline.result(frame_id)
+
+    model['on_result'] = on_result
+
+    def publish(frame_id, frame):
+        """Publish stage: draws the latest label and hands the frame to the stream"""
+        label = state['label']
+        # Passthrough frames are streamed untouched, dashboards get the label from /events/stream
+        if label and not isinstance(frame, CompressedFrame):
+            # Draw on a pooled copy, the inference stage may still be reading this frame
+            overlay = frame_pool.copy(frame)
+            cv2.putText(overlay.image, label, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
+            stream_hub.publish(overlay, frame_id)
+            overlay.release()  # the hub keeps its own reference
+        else:
+            # Hand the frame to the stream encoder (no copy, the hub takes a buffer reference)
+            stream_hub.publish(frame, frame_id)
+
+    base_interval = args.process_interval if args.no_motion_gate else 0.0
+    pipeline = cam.pipeline = Pipeline(
+        read_frame, infer, publish,
+        infer_interval=auto_tuner.settings['infer_interval'] if auto_tuner else base_interval,
+        infer_ready=inference_pool.wait_ready if inference_pool else None,
+        frame_ids=frame_ids, capture_time=lambda: capture_time(camera), trace=trace,
+        deferred_results=inference_pool is not None)
+    pipeline_start = time.time()
+    pipeline.run()
+    elapsed = time.time() - pipeline_start
+
+    stats = pipeline.stats()
+    print(f"{cam.camera_id} source finished: {stats['frames_captured']} frames in {elapsed:.1f}s "
+          f"({stats['frames_captured'] / max(elapsed, 1e-6):.1f} fps), "
+          f"{stats['frames_inferred']} inferred, {stats['inference_dropped']} dropped by inference")
+
+    # Live cameras are restarted; an offline source ends for good
+    finished = isinstance(camera, FrameSource)
+    if finished and landmark_recorder:
+        landmark_recorder.close()
+    return finished
 
 if __name__ == '__main__':
     # Parse command line arguments
     ap = argparse.ArgumentParser()
     ap.add_argument("--index", type=int, default=-1)
+    ap.add_argument("--source", default="usb",
+                    help="Frame source: usb, usb:N, video:PATH, images:DIR or synthetic (default: usb)")
+    ap.add_argument("--camera", action="append", default=[], metavar="SOURCE",
+                    help="Run one pipeline per camera, repeat for several cameras (same specs as --source, "
+                         "served as /video_feed/1, /video_feed/2, ...); default: one camera from --source / --index")
+    ap.add_argument("--inference-slots", type=int, default=1,
+                    help="Cameras that may run in-process inference at the same time (default: 1)")
+    ap.add_argument("--pace", choices=["realtime", "fast"], default="realtime",
+                    help="Offline sources: play at source frame rate or as fast as possible")
+    ap.add_argument("--loop", action="store_true", help="Offline sources: restart at end of input")
+    ap.add_argument("--max-frames", type=int, default=0, help="Offline sources: stop after N frames (0 = no limit)")
+    ap.add_argument("--passthrough", action="store_true",
+                    help="Stream the camera's own MJPEG frames without decode/re-encode, decode only for inference")
     ap.add_argument("--width", type=int, default=640)   # Lower default for better performance
     ap.add_argument("--height", type=int, default=480)  # Lower default for better performance
     ap.add_argument("--fps", type=int, default=15)     # Lower default for smoother streaming
-    ap.add_argument("--port", type=int, default=5000)
-    ap.add_argument("--process-interval", type=float, default=0.7, help="Process MediaPipe every N seconds (default: 0.5)")
+    ap.add_argument("--max-hands", type=int, default=1, help="Detect and track up to N hands (default: 1)")
+    ap.add_argument("--workers", type=int, default=0, help="Run inference in N worker processes over shared memory (default: 0 = in this process)")
+    ap.add_argument("--record-landmarks", metavar="PATH", help="Append the landmarks of every detected hand to this file (see reclassify.py)")
+    ap.add_argument("--roi", action="store_true", help="Run inference on a crop around the last hand, full frame only after a miss (single hand only)")
+    ap.add_argument("--roi-size", type=int, default=256, help="ROI mode: crop is resized to N x N pixels (default: 256)")
+    ap.add_argument("--roi-expand", type=float, default=1.8, help="ROI mode: crop size relative to the hand bounding box (default: 1.8)")
+    ap.add_argument("--search-width", type=int, default=640, help="ROI mode: full-frame searches run on a copy downscaled to this width (default: 640)")
+    ap.add_argument("--port", type=int, default=5500)
+    ap.add_argument("--detector", choices=["mediapipe", "stub"], default="mediapipe",
+                    help="Hand detector, 'stub' finds no hands and needs no model (for load tests)")
+    ap.add_argument("--stub-delay", type=float, default=0.0, help="With --detector stub: simulated inference time in seconds")
+    ap.add_argument("--async-server", action="store_true",
+                    help="Serve with a single asyncio thread instead of Flask's thread per connection (no index page or clip downloads)")
+    ap.add_argument("--idle-interval", type=float, default=2.0, help="Run MediaPipe every N seconds when there is no motion (default: 2.0)")
+    ap.add_argument("--active-interval", type=float, default=0.0, help="Run MediaPipe every N seconds while there is motion (default: 0 = every frame)")
+    ap.add_argument("--motion-hold", type=float, default=1.5, help="Stay at the active rate N seconds after motion stops (default: 1.5)")
+    ap.add_argument("--motion-threshold", type=float, default=0.005, help="Fraction of changed pixels that counts as motion (default: 0.005)")
+    ap.add_argument("--motion-pixel-threshold", type=int, default=25, help="Gray level change that counts as a changed pixel (default: 25)")
+    ap.add_argument("--motion-width", type=int, default=160, help="Width of the downscaled frame used for motion detection (default: 160)")
+    ap.add_argument("--no-motion-gate", action="store_true", help="Use the fixed --process-interval timer instead of motion gating")
+    ap.add_argument("--process-interval", type=float, default=0.7, help="With --no-motion-gate: process MediaPipe every N seconds (default: 0.7)")
+    ap.add_argument("--clip-pre", type=float, default=3.0, help="Seconds of video kept before an event clip (default: 3.0)")
+    ap.add_argument("--clip-post", type=float, default=3.0, help="Seconds of video recorded after an event (default: 3.0)")
+    ap.add_argument("--clip-memory-mb", type=int, default=32, help="Memory cap for buffered and unwritten clip frames in MB (default: 32)")
+    ap.add_argument("--clips-per-minute", type=int, default=6, help="At most N clips started per minute (default: 6)")
+    ap.add_argument("--no-clips", action="store_true", help="Don't record video clips around events")
+    ap.add_argument("--trace", type=int, default=0, metavar="SPANS",
+                    help="Keep the last N per-frame stage timings for /api/trace (Chrome trace JSON, default: 0 = off)")
+    ap.add_argument("--auto-tune", action="store_true",
+                    help="Adjust inference interval, inference size and stream quality at runtime to stay within "
+                         "--cpu-budget and --latency-budget-ms (see /api/tuning)")
+    ap.add_argument("--cpu-budget", type=float, default=60.0, help="Auto-tune: CPU budget in percent of all cores (default: 60)")
+    ap.add_argument("--latency-budget-ms", type=float, default=150.0, help="Auto-tune: gesture latency budget in ms (default: 150)")
     args = ap.parse_args()
+    if args.roi and args.max_hands > 1:
+        print("ROI mode tracks a single hand, ignoring --roi with --max-hands > 1")
+        args.roi = False
+    if args.roi and args.workers:
+        print("ROI mode keeps tracking state in this process, ignoring --roi with --workers")
+        args.roi = False
     
-    # Start camera thread
-    cam_thread = threading.Thread(target=camera_thread, args=(args,), daemon=True)
-    cam_thread.start()
+    # One camera from --source / --index unless cameras were listed with --camera
+    specs = [(args.source, args.index)] if not args.camera else [(spec, -1) for spec in args.camera]
+    inference_gate.slots = args.inference_slots
+    for number, (spec, cam_index) in enumerate(specs, 1):
+        name = str(number)
+        cameras[name] = CameraFeed(name, spec, cam_index)
+        # Fixed devices are claimed up front so probing cameras skip them
+        kind, _, target = spec.partition(':')
+        if kind == 'usb' and (target or cam_index >= 0):
+            usb_claimed[int(target) if target else cam_index] = name
+
+    if args.trace:
+        tracer = TraceRecorder(args.trace)
+        event_shipper.trace = tracer.span
+
+    # Start stream encoders, event shipper and one supervised thread per camera
+    event_shipper.start()
+    for name, cam in cameras.items():
+        if tracer:
+            cam.stream_hub.trace = tracer.tracer(cam.camera_id)
+        cam.stream_hub.start()
+        if args.record_landmarks:
+            path = args.record_landmarks
+            if len(cameras) > 1:
+                root, ext = os.path.splitext(path)
+                path = f"{root}-{name}{ext}"
+            cam.landmark_recorder = LandmarkRecorder(path)
+        if not args.no_clips:
+            cam.clip_recorder = ClipRecorder(cam.stream_hub, CLIP_DIR, args.clip_pre, args.clip_post,
+                                             args.clip_memory_mb * 1024 * 1024, args.clips_per_minute,
+                                             prefix=f"cam{name}-" if len(cameras) > 1 else '').start()
+    if args.auto_tune:
+        auto_tuner = AutoTuner(gesture_latency, apply_tuning, args.cpu_budget, args.latency_budget_ms,
+                               base_interval=args.process_interval if args.no_motion_gate else 0.0,
+                               base_quality=STREAM_QUALITY).start()
+    supervisor = Supervisor(lambda cam: run_camera(cam, args),
+                            on_change=lambda cam, state: cam.status_board.update(camera=camera_info(cam)))
+    for name, cam in cameras.items():
+        supervisor.add(name, cam)
+    supervisor.start()
     
-    # Give camera time to initialize
-    time.sleep(2)
-    
-    # Start Flask server
+    # Start Flask server right away, /api/ready reports when the first frame is in
     print("Starting web server...")
-    print(f"Open http://localhost:5500 in your browser")
-    print(f"Or access from another device: http://<jetson-ip>:5500")
-    app.run(host='0.0.0.0', port=5500, threaded=True, debug=False)
+    print(f"Open http://localhost:{args.port} in your browser")
+    print(f"Or access from another device: http://<jetson-ip>:{args.port}")
+    if args.async_server:
+        # Viewers are coroutines woken by new frames / events instead of one thread each
+        AsyncServer(default_camera().stream_hub, event_log, async_routes(),
+                    feeds={name: cam.stream_hub for name, cam in cameras.items()}).run(port=args.port)
+    else:
+        app.run(host='0.0.0.0', port=args.port, threaded=True, debug=False)
@@ -0,0 +1,214 @@
+import asyncio
+import json
+from urllib.parse import parse_qsl, urlsplit
+from events import format_sse, parse_cursor
+from metrics import metrics
+from streaming import mjpeg_part, profile_args
+
+REASONS = {200: 'OK', 204: 'No Content', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+
+class AsyncServer:
+    """Single-threaded asyncio HTTP server for the stream, event and status routes.
+
+    An alternative to Flask's thread-per-connection server: every viewer
+    is a coroutine parked on a future until the hub (or the event log)
+    reports something new, so idle viewers cost no thread and no wakeups.
+    The hub and event log call back from their own threads through
+    call_soon_threadsafe.
+
+    /video_feed, /events, /events/stream and /metrics are built in, as is
+    /video_feed/<name> for every hub in `feeds` (name -> hub). Other GET
+    routes are plain functions in `routes`: path -> fn(query) returning
+    (status, body bytes, etag or None), answered with 304 when the
+    client's If-None-Match matches.
+    """
+
+    def __init__(self, hub, event_log, routes, keepalive=15.0, feeds=None):
+        self.hub = hub
+        self.feeds = feeds or {}
+        self.event_log = event_log
+        self.routes = routes
+        self.keepalive = keepalive
+        self.loop = None
+        self.frame_waiters = {}  # (hub id, profile key) -> futures of clients waiting for its next frame
+        self.event_waiters = []
+        self.connections = 0
+
+    def run(self, host='0.0.0.0', port=5500):
+        """Serve forever in the calling thread"""
+        asyncio.run(self._serve(host, port))
+
+    async def _serve(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        for hub in {id(hub): hub for hub in [self.hub, *self.feeds.values()]}.values():
+            hub.listeners.append(lambda prof, hub=hub: self._on_frame(hub, prof))
+        self.event_log.listeners.append(self._on_event)
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    # Called from encoder / inference threads, the wakeup itself runs on the loop
+    def _on_frame(self, hub, prof):
+        self.loop.call_soon_threadsafe(self._wake_frame, (id(hub), prof.key))
+
+    def _on_event(self, seq):
+        self.loop.call_soon_threadsafe(self._wake_events)
+
+    def _wake_frame(self, key):
+        self._wake(self.frame_waiters.pop(key, []))
+
+    def _wake_events(self):
+        waiters, self.event_waiters = self.event_waiters, []
+        self._wake(waiters)
+
+    @staticmethod
+    def _wake(waiters):
+        for fut in waiters:
+            if not fut.done():
+                fut.set_result(None)
+
+    async def _wait(self, waiters, timeout):
+        fut = self.loop.create_future()
+        waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # Idle viewers time out over and over, the list must not keep their futures
+            if fut in waiters:
+                waiters.remove(fut)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split(' ')
+                if len(parts) != 3:
+                    await self._respond(writer, 400, b'')
+                    break
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                url = urlsplit(target)
+                query = dict(parse_qsl(url.query))
+
+                if method == 'OPTIONS':
+                    await self._respond(writer, 204, b'', {'Access-Control-Allow-Methods': 'GET',
+                                                           'Access-Control-Allow-Headers': '*'})
+                elif method != 'GET':
+                    await self._respond(writer, 405, b'')
+                elif url.path == '/video_feed' or url.path.startswith('/video_feed/'):
+                    name = url.path[len('/video_feed/'):]
+                    hub = self.feeds.get(name) if name else self.hub
+                    if hub is None:
+                        await self._respond(writer, 404, b'{"error": "unknown camera"}')
+                        continue
+                    await self._video_feed(writer, hub, query)
+                    break
+                elif url.path == '/events/stream':
+                    await self._event_stream(writer, query, headers)
+                    break
+                else:
+                    await self._simple(writer, url.path, query, headers)
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _respond(self, writer, status, body, headers=None, content_type='application/json'):
+        lines = [f'HTTP/1.1 {status} {REASONS.get(status, "")}',
+                 f'Content-Type: {content_type}',
+                 f'Content-Length: {len(body)}',
+                 'Access-Control-Allow-Origin: *']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _start_stream(self, writer, content_type):
+        writer.write(('HTTP/1.1 200 OK\r\n'
+                      f'Content-Type: {content_type}\r\n'
+                      'Cache-Control: no-cache\r\n'
+                      'Access-Control-Allow-Origin: *\r\n'
+                      'Connection: close\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+    async def _simple(self, writer, path, query, headers):
+        if path == '/events':
+            since = parse_cursor(query.get('since'))
+            result = [dict(data, seq=seq) for seq, _, data in self.event_log.since(since or 0, kind='event')]
+            await self._respond(writer, 200, json.dumps(result).encode(),
+                                {'X-Last-Seq': str(self.event_log.last_seq)})
+            return
+        if path == '/metrics':
+            await self._respond(writer, 200, metrics.render().encode(),
+                                content_type='text/plain; version=0.0.4')
+            return
+        route = self.routes.get(path)
+        if route is None:
+            await self._respond(writer, 404, b'{"error": "not found"}')
+            return
+        status, body, etag = route(query)
+        if etag is None:
+            await self._respond(writer, status, body)
+            return
+        extra = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+        if f'"{etag}"' in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+            await self._respond(writer, 304, b'', extra)
+        else:
+            await self._respond(writer, status, body, extra)
+
+    async def _video_feed(self, writer, hub, query):
+        prof = hub.profile(**profile_args(query))
+        hub.subscribe(prof)
+        try:
+            await self._start_stream(writer, 'multipart/x-mixed-replace; boundary=frame')
+            version = 0
+            while True:
+                new_version, jpeg, frame_id = hub.latest(prof)
+                if new_version == version:
+                    # Parked until the hub has encoded a new frame for this profile
+                    await self._wait(self.frame_waiters.setdefault((id(hub), prof.key), []), self.keepalive)
+                    continue
+                version = new_version
+                metrics.inc('frames_streamed_total')
+                writer.write(mjpeg_part(jpeg, frame_id))
+                # A slow viewer only holds up its own coroutine, and then skips to the newest frame
+                await writer.drain()
+        finally:
+            hub.unsubscribe(prof)
+
+    async def _event_stream(self, writer, query, headers):
+        since = parse_cursor(headers.get('last-event-id'))
+        if since is None:
+            since = parse_cursor(query.get('since'))
+        seq = self.event_log.last_seq if since is None else since
+        await self._start_stream(writer, 'text/event-stream')
+        while True:
+            entries = self.event_log.since(seq)
+            if not entries:
+                await self._wait(self.event_waiters, self.keepalive)
+                entries = self.event_log.since(seq)
+                if not entries:
+                    writer.write(b': keepalive\n\n')
+                    await writer.drain()
+                    continue
+            for entry in entries:
+                seq = entry[0]
+                writer.write(format_sse(entry).encode())
+            await writer.drain()
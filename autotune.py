@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from collections import deque
+from metrics import metrics
+
+# Knob settings from most to least expensive
+INTERVALS = (0.0, 0.05, 0.1, 0.2, 0.35, 0.5)  # seconds between inferences
+INFER_WIDTHS = (None, 480, 320, 256)  # inference input width, None = full frame
+QUALITIES = (60, 50, 40, 30)  # JPEG quality of the default stream
+
+
+class AutoTuner:
+    """Holds the process within a CPU and gesture-latency budget by turning three knobs.
+
+    Every `period` seconds it samples the process CPU (process_time over
+    wall time, as a percent of all cores) and the gesture latency (the
+    slowest camera's capture -> gesture time plus the inference interval,
+    i.e. how late a gesture can show up). Over budget it makes one step
+    cheaper, in this order: a longer inference interval (as long as the
+    latency budget allows), a smaller inference input, a lower stream
+    quality. Over the latency budget alone it first shortens the interval.
+    After `hold` samples in a row with both below `headroom` of their
+    budget it undoes one step, in the reverse order. One step per sample
+    keeps it from oscillating.
+
+    latency() returns the current capture -> gesture seconds (None before
+    the first inference); apply(settings) pushes new settings out.
+    """
+
+    def __init__(self, latency, apply, cpu_percent=60.0, latency_ms=150.0, base_interval=0.0,
+                 base_quality=60, period=2.0, hold=3, headroom=0.75):
+        self.latency = latency
+        self.apply = apply
+        self.budget = {'cpu_percent': cpu_percent, 'latency_ms': latency_ms}
+        self.enabled = True
+        self.period = period
+        self.hold = hold
+        self.headroom = headroom
+        self.cores = os.cpu_count() or 1
+        # The launch settings are the most expensive the tuner will pick
+        self.intervals = tuple(sorted({base_interval} | {i for i in INTERVALS if i > base_interval}))
+        self.qualities = tuple(sorted({base_quality} | {q for q in QUALITIES if q < base_quality}, reverse=True))
+        self.steps = {'interval': 0, 'infer_width': 0, 'quality': 0}
+        self.calm = 0  # samples in a row with headroom
+        self.sample = {'cpu_percent': None, 'latency_ms': None}
+        self.history = deque(maxlen=10)
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def settings(self):
+        return {
+            'infer_interval': self.intervals[self.steps['interval']],
+            'infer_width': INFER_WIDTHS[self.steps['infer_width']],
+            'stream_quality': self.qualities[self.steps['quality']],
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def set_budget(self, cpu_percent=None, latency_ms=None, enabled=None):
+        """Change the budget at runtime, values must be positive and enabled a boolean"""
+        if enabled is not None and not isinstance(enabled, bool):
+            # bool('false') would be True
+            raise ValueError("enabled must be true or false")
+        changes = {}
+        for name, value in (('cpu_percent', cpu_percent), ('latency_ms', latency_ms)):
+            if value is None:
+                continue
+            changes[name] = float(value)
+            if not changes[name] > 0:
+                raise ValueError(f"{name} must be positive")
+        with self.lock:
+            self.budget.update(changes)
+            if enabled is not None:
+                self.enabled = enabled
+                if not self.enabled:
+                    # Back to the launch settings
+                    self.steps = dict.fromkeys(self.steps, 0)
+                    self.apply(self.settings)
+            self.calm = 0
+
+    def _loop(self):
+        last_cpu, last_wall = time.process_time(), time.time()
+        while True:
+            time.sleep(self.period)
+            cpu, wall = time.process_time(), time.time()
+            cpu_percent = (cpu - last_cpu) / max(wall - last_wall, 1e-6) / self.cores * 100
+            last_cpu, last_wall = cpu, wall
+            with self.lock:
+                self.step(cpu_percent, self.latency())
+
+    def step(self, cpu_percent, latency):
+        """One control decision from a CPU / latency sample, returns the action taken or None"""
+        interval = self.settings['infer_interval']
+        latency_ms = (latency + interval) * 1000 if latency is not None else None
+        self.sample = {'cpu_percent': round(cpu_percent, 1),
+                       'latency_ms': round(latency_ms, 1) if latency_ms is not None else None}
+        if not self.enabled:
+            return None
+
+        cpu_budget, latency_budget = self.budget['cpu_percent'], self.budget['latency_ms']
+        over_cpu = cpu_percent > cpu_budget
+        over_latency = latency_ms is not None and latency_ms > latency_budget
+        action = None
+        if over_cpu or over_latency:
+            self.calm = 0
+            processing_ms = latency * 1000 if latency is not None else 0.0
+            next_interval = self._next('interval', self.intervals)
+            if over_cpu and not over_latency and next_interval is not None \
+                    and processing_ms + next_interval * 1000 <= latency_budget:
+                action = self._move('interval', 1)
+            elif over_latency and not over_cpu and self.steps['interval'] > 0:
+                action = self._move('interval', -1)
+            elif self._next('infer_width', INFER_WIDTHS) is not None:
+                # Smaller inputs cut both the CPU and the processing part of the latency
+                action = self._move('infer_width', 1)
+            elif over_cpu and self._next('quality', self.qualities) is not None:
+                action = self._move('quality', 1)
+            reason = ', '.join(f"{name} over budget" for name, over in
+                               (('cpu', over_cpu), ('latency', over_latency)) if over)
+        elif cpu_percent < cpu_budget * self.headroom and \
+                (latency_ms is None or latency_ms < latency_budget * self.headroom):
+            self.calm += 1
+            if self.calm >= self.hold:
+                self.calm = 0
+                for knob in ('quality', 'infer_width', 'interval'):
+                    if self.steps[knob] > 0:
+                        action = self._move(knob, -1)
+                        break
+            reason = 'headroom'
+        else:
+            self.calm = 0
+
+        if action:
+            metrics.inc('autotune_changes_total')
+            self.history.append({'time': round(time.time(), 3), 'action': action, 'reason': reason,
+                                 'cpu_percent': self.sample['cpu_percent'], 'latency_ms': self.sample['latency_ms']})
+            print(f"Auto-tune: {action} ({reason})")
+            self.apply(self.settings)
+        return action
+
+    def _next(self, knob, values):
+        pos = self.steps[knob] + 1
+        return values[pos] if pos < len(values) else None
+
+    def _move(self, knob, delta):
+        before = self.settings
+        self.steps[knob] += delta
+        name = {'interval': 'infer_interval', 'infer_width': 'infer_width', 'quality': 'stream_quality'}[knob]
+        return f"{name} {before[name]} -> {self.settings[name]}"
+
+    def stats(self):
+        """Budget, last sample, current settings and recent decisions"""
+        return {
+            'enabled': self.enabled,
+            'budget': dict(self.budget),
+            'sample': dict(self.sample),
+            'settings': self.settings,
+            'recent': list(self.history),
+        }
@@ -0,0 +1,135 @@
+import threading
+import numpy as np
+from metrics import metrics
+
+
+class PooledFrame:
+    """A frame buffer borrowed from a FramePool.
+
+    Every holder (pipeline slot, stream encoder, ...) takes its own
+    reference with retain() and gives it back with release(); the buffer
+    only goes back to the pool when the last reference is released, so it
+    is never overwritten while someone still reads it.
+    """
+
+    __slots__ = ('image', 'pool', 'refs')
+
+    def __init__(self, image, pool):
+        self.image = image
+        self.pool = pool
+        self.refs = 1
+
+    def retain(self):
+        with self.pool.lock:
+            self.refs += 1
+        return self
+
+    def release(self):
+        with self.pool.lock:
+            self.refs -= 1
+            if self.refs == 0:
+                self.pool._recycle(self)
+
+
+def retain(frame):
+    """Take a reference if frame is pooled, returns the frame"""
+    if isinstance(frame, PooledFrame):
+        frame.retain()
+    return frame
+
+
+def release(frame):
+    """Drop a reference if frame is pooled"""
+    if isinstance(frame, PooledFrame):
+        frame.release()
+
+
+def unwrap(frame):
+    """The pixels of a pooled frame, any other frame as-is"""
+    return frame.image if isinstance(frame, PooledFrame) else frame
+
+
+class FramePool:
+    """Fixed set of reusable frame buffers the capture stage reads into.
+
+    read(source) passes a free buffer to source.read(image=...), so the
+    camera writes straight into memory that is recycled instead of
+    allocating a new frame every time. The buffer size follows whatever
+    the source delivers; at most `size` idle buffers are kept.
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self.lock = threading.Lock()
+        self.shape = None
+        self._free = []
+        self.allocated = 0
+        self.reused = 0
+        self.in_use = 0
+
+    def get(self, shape=None, dtype=np.uint8):
+        """A buffer with refs=1, reused when one of the right shape is free"""
+        shape = tuple(shape) if shape is not None else self.shape
+        with self.lock:
+            if shape != self.shape:
+                # Frame size changed, the idle buffers are no use anymore
+                self.shape = shape
+                self._free = []
+            self.in_use += 1
+            if self._free:
+                frame = self._free.pop()
+                frame.refs = 1
+                self.reused += 1
+                return frame
+            self.allocated += 1
+        metrics.inc('frame_buffers_allocated_total')
+        return PooledFrame(np.empty(shape, dtype), self)
+
+    def adopt(self, image):
+        """Wrap an array the source allocated itself so it is recycled from now on"""
+        with self.lock:
+            if image.shape != self.shape:
+                self.shape = image.shape
+                self._free = []
+            self.in_use += 1
+            self.allocated += 1
+        metrics.inc('frame_buffers_allocated_total')
+        return PooledFrame(image, self)
+
+    def read(self, source):
+        """Read the next frame of source into a pooled buffer, returns (ok, frame)
+
+        Sources that cannot fill a given buffer (JPEG passthrough, still
+        images) just return their own frame, which is adopted or passed on.
+        """
+        buf = self.get() if self.shape is not None else None
+        ok, image = source.read(image=buf.image if buf else None)
+        if buf is not None and ok and image is buf.image:
+            return True, buf
+        if buf is not None:
+            buf.release()
+        if not ok or not isinstance(image, np.ndarray):
+            return ok, image
+        return True, self.adopt(image)
+
+    def copy(self, frame):
+        """Pooled copy of a frame, e.g. to draw an overlay without touching the original"""
+        image = unwrap(frame)
+        out = self.get(image.shape, image.dtype)
+        np.copyto(out.image, image)
+        return out
+
+    def _recycle(self, frame):
+        # Called with the lock held
+        self.in_use -= 1
+        if frame.image.shape == self.shape and len(self._free) < self.size:
+            self._free.append(frame)
+
+    def stats(self):
+        """Counters for the status endpoint"""
+        return {
+            'allocated': self.allocated,
+            'reused': self.reused,
+            'in_use': self.in_use,
+            'free': len(self._free),
+        }
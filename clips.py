@@ -0,0 +1,170 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from metrics import metrics
+
+
+class ClipRecorder:
+    """Keeps the last few seconds of stream JPEGs and saves clips around events.
+
+    A background thread follows the hub's default stream profile (frames
+    are already JPEG, nothing is encoded twice) into a ring buffer of the
+    last `pre` seconds. trigger() starts a clip made of the buffered `pre`
+    seconds plus the next `post` seconds; finished clips go to a writer
+    thread, so neither the camera nor the inference stage ever waits on the
+    disk. Clips are motion JPEG files (concatenated JPEGs, playable with
+    ffplay / VLC). At most max_per_minute clips are started per minute,
+    later triggers get no clip.
+
+    The ring, the clips being recorded and the clips waiting for the writer
+    share one memory budget of max_bytes. A frame held by several of them
+    counts once for each, so the real footprint stays below it. Over the
+    budget the ring loses its oldest frames first, then clips being
+    recorded end early.
+    """
+
+    def __init__(self, hub, clip_dir, pre=3.0, post=3.0, max_bytes=32 * 1024 * 1024,
+                 max_per_minute=6, max_pending=4, prefix=''):
+        self.hub = hub
+        self.prefix = prefix  # file name prefix, keeps the clips of several cameras apart
+        self.clip_dir = clip_dir
+        self.pre = pre
+        self.post = post
+        self.max_bytes = max_bytes
+        self.max_per_minute = max_per_minute
+        self.ring = deque()  # (timestamp, jpeg bytes)
+        self.ring_bytes = 0
+        self.active = []  # clips still collecting post-event frames
+        self.queued_bytes = 0  # finished clips not written yet
+        self.started = deque()  # start times of recent clips, for the rate limit
+        self.lock = threading.Lock()
+        self.write_queue = queue.Queue(maxsize=max_pending)
+        self._threads = []
+        self.clips_written = 0
+        self.clips_rate_limited = 0
+        self.clips_dropped = 0  # writer too far behind
+        self.clips_truncated = 0  # ended early to stay within max_bytes
+        self.bytes_written = 0
+
+    def start(self):
+        """Start the frame buffering and clip writer threads"""
+        if not self._threads:
+            os.makedirs(self.clip_dir, exist_ok=True)
+            for target in (self._buffer_loop, self._write_loop):
+                thread = threading.Thread(target=target, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def trigger(self, now=None):
+        """Start a clip around this moment, returns its file name or None when rate limited"""
+        now = now or time.time()
+        with self.lock:
+            while self.started and now - self.started[0] >= 60.0:
+                self.started.popleft()
+            if len(self.started) >= self.max_per_minute:
+                self.clips_rate_limited += 1
+                return None
+            self.started.append(now)
+            name = (self.prefix + time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+                    + f'-{int(now * 1000) % 1000:03d}.mjpeg')
+            frames = [jpeg for ts, jpeg in self.ring if ts >= now - self.pre]
+            clip = {'name': name, 'until': now + self.post, 'frames': frames,
+                    'bytes': sum(len(jpeg) for jpeg in frames)}
+            self.active.append(clip)
+            # The pre-roll of this clip comes out of the ring's share of the budget
+            while self.ring and self._held() > self.max_bytes:
+                self._drop_oldest()
+            while clip['frames'] and self._held() > self.max_bytes:
+                clip['bytes'] -= len(clip['frames'].pop(0))
+        return name
+
+    def _held(self):
+        return self.ring_bytes + sum(clip['bytes'] for clip in self.active) + self.queued_bytes
+
+    def _drop_oldest(self):
+        self.ring_bytes -= len(self.ring.popleft()[1])
+
+    def _buffer_loop(self):
+        prof = self.hub.profile()
+        self.hub.subscribe(prof)
+        version = 0
+        while True:
+            new_version, jpeg, _ = self.hub.wait_for_frame(prof, version)
+            now = time.time()
+            if new_version != version:
+                version = new_version
+                self._add(now, jpeg)
+            self._finish_due(now)
+
+    def _add(self, now, jpeg):
+        size = len(jpeg)
+        with self.lock:
+            self.ring.append((now, jpeg))
+            self.ring_bytes += size
+            # Old enough to be in no future clip
+            while self.ring and self.ring[0][0] < now - self.pre:
+                self._drop_oldest()
+            for clip in self.active:
+                # Room for the frame comes out of the ring first, a clip that still does not fit ends here
+                while self.ring and self._held() + size > self.max_bytes:
+                    self._drop_oldest()
+                if self._held() + size > self.max_bytes:
+                    clip['until'] = now
+                    self.clips_truncated += 1
+                    continue
+                clip['frames'].append(jpeg)
+                clip['bytes'] += size
+            while self.ring and self._held() > self.max_bytes:
+                self._drop_oldest()
+
+    def _finish_due(self, now):
+        with self.lock:
+            done = [clip for clip in self.active if now >= clip['until']]
+            self.active = [clip for clip in self.active if now < clip['until']]
+            for clip in done:
+                try:
+                    self.write_queue.put_nowait(clip)
+                except queue.Full:
+                    self.clips_dropped += 1
+                    print(f"Clip writer behind, dropped {clip['name']}")
+                    continue
+                self.queued_bytes += clip['bytes']
+
+    def _write_loop(self):
+        while True:
+            clip = self.write_queue.get()
+            path = os.path.join(self.clip_dir, clip['name'])
+            start = time.perf_counter()
+            try:
+                # Write under a temporary name so a half-written clip is never served
+                with open(path + '.part', 'wb') as f:
+                    for jpeg in clip['frames']:
+                        f.write(jpeg)
+                os.replace(path + '.part', path)
+            except OSError as e:
+                print(f"Could not write clip {path}: {e}")
+                continue
+            finally:
+                with self.lock:
+                    self.queued_bytes -= clip['bytes']
+            metrics.observe('clip_write', time.perf_counter() - start)
+            self.clips_written += 1
+            self.bytes_written += clip['bytes']
+
+    def stats(self):
+        """Counters for the status endpoint"""
+        with self.lock:
+            return {
+                'buffered_frames': len(self.ring),
+                'buffered_bytes': self.ring_bytes,
+                'recording': len(self.active),
+                'held_bytes': self._held(),
+                'clips_written': self.clips_written,
+                'clips_rate_limited': self.clips_rate_limited,
+                'clips_dropped': self.clips_dropped,
+                'clips_truncated': self.clips_truncated,
+                'bytes_written': self.bytes_written,
+            }
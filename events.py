@@ -0,0 +1,87 @@
+import json
+import threading
+from collections import deque
+
+
+class EventLog:
+    """Bounded ring buffer of events with monotonically increasing sequence numbers.
+
+    Readers keep their own cursor (the last seq they saw) and ask for
+    everything after it, so any number of consumers can follow the log
+    without removing events for each other. Old entries fall off the end
+    once maxlen is reached. A cursor ahead of the log (kept by a client
+    across a restart of this process) counts as 0, so the client gets the
+    whole buffer instead of waiting for the new numbers to catch up.
+    """
+
+    def __init__(self, maxlen=1000):
+        self._entries = deque(maxlen=maxlen)  # (seq, kind, data)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.listeners = []  # callables run after every append, e.g. to wake asyncio readers
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def append(self, data, kind='event'):
+        """Add an entry and wake up waiting readers, returns its seq"""
+        with self._cond:
+            self._seq += 1
+            self._entries.append((self._seq, kind, data))
+            self._cond.notify_all()
+            seq = self._seq
+        for listener in self.listeners:
+            listener(seq)
+        return seq
+
+    def _cursor(self, seq):
+        return 0 if seq > self._seq else seq
+
+    def _after(self, seq):
+        seq = self._cursor(seq)
+        if not self._entries or seq >= self._seq:
+            return []
+        # Sequence numbers are contiguous, so the start index follows from the first one
+        start = max(seq - self._entries[0][0] + 1, 0)
+        return [self._entries[i] for i in range(start, len(self._entries))]
+
+    def since(self, seq, kind=None):
+        """Entries with a sequence number above seq, optionally of one kind"""
+        with self._cond:
+            entries = self._after(seq)
+        return [e for e in entries if kind is None or e[1] == kind]
+
+    def wait(self, seq, timeout=None):
+        """Block until there are entries after seq (or timeout), returns them"""
+        with self._cond:
+            seq = self._cursor(seq)
+            self._cond.wait_for(lambda: self._seq > seq, timeout)
+            return self._after(seq)
+
+    def stream(self, seq=None, keepalive=15.0):
+        """Generator of Server-Sent Events starting after seq (None = only new entries)"""
+        if seq is None:
+            seq = self._seq
+        while True:
+            entries = self.wait(seq, keepalive)
+            if not entries:
+                yield ': keepalive\n\n'
+                continue
+            for entry in entries:
+                seq = entry[0]
+                yield format_sse(entry)
+
+
+def format_sse(entry):
+    """One (seq, kind, data) entry as a Server-Sent Event"""
+    seq, kind, data = entry
+    return f'id: {seq}\nevent: {kind}\ndata: {json.dumps(dict(data, seq=seq))}\n\n'
+
+
+def parse_cursor(value):
+    """Parse a ?since= / Last-Event-ID value, None if missing or invalid"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,124 @@
+import numpy as np
+
+# Hand landmark indices per finger (index, middle, ring, pinky)
+TIPS = np.array([8, 12, 16, 20])
+PIPS = np.array([6, 10, 14, 18])
+MCPS = np.array([5, 9, 13, 17])
+INDEX, MIDDLE, RING, PINKY = range(4)
+
+# Rule thresholds (curl: higher = more curled)
+FIST_MARGIN = 0.02           # tip may sit this fraction of h above the pip and still count as folded
+EXTENDED_CURL = 0.3          # scissors / paper: finger clearly extended
+SCISSORS_RING_FOLDED = 0.5
+SCISSORS_PINKY_FOLDED = 0.4
+MIDDLE_EXTENDED_CURL = 0.6
+MIDDLE_MARGIN = 0.1          # other fingers must be this much more curled than the middle one
+
+# Codes returned by classify_batch, in rule priority order
+GESTURES = (None, 'middle_finger', 'rock', 'scissors', 'paper')
+LABELS = {
+    None: '',
+    'middle_finger': 'MIDDLE FINGER',
+    'rock': 'ROCK (FIST)',
+    'scissors': 'SCISSORS (PEACE)',
+    'paper': 'PAPER (OPEN HAND)'
+}
+
+
+def landmarks_to_array(landmarks):
+    """Convert MediaPipe landmarks to a (21,3) float32 array of normalized x, y, z"""
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmarks], dtype=np.float32)
+
+
+def finger_curls(points, h):
+    """Curl of the 4 fingers for (N,21,3) points, returns (N,4) (higher = more curled)
+
+    Math is done in float64 so results match the old per-landmark Python rules exactly.
+    """
+    y = points[..., 1].astype(np.float64) * np.asarray(h, dtype=np.float64).reshape(-1, 1)
+    tip_y, pip_y, mcp_y = y[:, TIPS], y[:, PIPS], y[:, MCPS]
+    # Relative position of tip compared to pip-mcp range
+    return (tip_y - pip_y) / np.maximum(np.abs(mcp_y - pip_y), 1)
+
+
+def fist_mask(points, h, margin=FIST_MARGIN):
+    """Rock: all 4 finger tips at or below their pip (within margin * h), returns (N,) bool"""
+    h = np.asarray(h, dtype=np.float64).reshape(-1, 1)
+    y = points[..., 1].astype(np.float64) * h
+    return np.all(y[:, TIPS] > y[:, PIPS] - h * margin, axis=1)
+
+
+def default_thresholds():
+    """Current rule thresholds by name, the keys classify_batch accepts as overrides"""
+    return {
+        'FIST_MARGIN': FIST_MARGIN,
+        'EXTENDED_CURL': EXTENDED_CURL,
+        'SCISSORS_RING_FOLDED': SCISSORS_RING_FOLDED,
+        'SCISSORS_PINKY_FOLDED': SCISSORS_PINKY_FOLDED,
+        'MIDDLE_EXTENDED_CURL': MIDDLE_EXTENDED_CURL,
+        'MIDDLE_MARGIN': MIDDLE_MARGIN,
+    }
+
+
+def classify_batch(points, h, thresholds=None):
+    """Classify (N,21,3) landmark arrays in one call, returns (N,) codes into GESTURES
+
+    h is the frame height, either a scalar or one value per hand.
+    thresholds optionally overrides some of default_thresholds() by name.
+    """
+    t = default_thresholds()
+    if thresholds:
+        unknown = set(thresholds) - set(t)
+        if unknown:
+            raise ValueError(f"Unknown thresholds: {', '.join(sorted(unknown))}")
+        t.update(thresholds)
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 21, 3)
+    curls = finger_curls(points, h)
+    index, middle, ring, pinky = curls[:, INDEX], curls[:, MIDDLE], curls[:, RING], curls[:, PINKY]
+
+    # Middle finger: middle extended and at least 2 other fingers more curled than it
+    more_folded = curls[:, [INDEX, RING, PINKY]] > (middle + t['MIDDLE_MARGIN'])[:, None]
+    middle_finger = (middle < t['MIDDLE_EXTENDED_CURL']) & (more_folded.sum(axis=1) >= 2)
+
+    rock = fist_mask(points, h, t['FIST_MARGIN'])
+
+    # Scissors: index and middle clearly extended, ring and pinky clearly folded
+    extended = t['EXTENDED_CURL']
+    scissors = ((index < extended) & (middle < extended) &
+                (ring > t['SCISSORS_RING_FOLDED']) & (pinky > t['SCISSORS_PINKY_FOLDED']))
+
+    # Paper: all 4 fingers clearly extended
+    paper = np.all(curls < extended, axis=1)
+
+    # Middle finger is checked first (a fist would also match 3 folded fingers)
+    return np.select([middle_finger, rock, scissors, paper], [1, 2, 3, 4], default=0)
+
+
+def detect_gesture(landmarks, h, w):
+    """Detect rock, paper, scissors, or middle finger gesture"""
+    if not isinstance(landmarks, np.ndarray):
+        landmarks = landmarks_to_array(landmarks)
+    gesture = GESTURES[int(classify_batch(landmarks, h)[0])]
+    return gesture, LABELS[gesture]
+
+
+def hands_to_array(hands):
+    """Convert a list of MediaPipe hand landmark lists to one (N,21,3) float32 array"""
+    if not hands:
+        return np.empty((0, 21, 3), dtype=np.float32)
+    return np.array([[(lm.x, lm.y, lm.z) for lm in landmarks] for landmarks in hands], dtype=np.float32)
+
+
+def classify_points(points, h):
+    """Classify (N,21,3) landmark arrays in one call, returns [(gesture, label), ...]"""
+    if not len(points):
+        return []
+    gestures = [GESTURES[int(code)] for code in classify_batch(points, h)]
+    return [(gesture, LABELS[gesture]) for gesture in gestures]
+
+
+def hand_results(res):
+    """Landmarks and handedness of a MediaPipe Hands result, returns ((N,21,3) points, [handedness, ...])"""
+    found = res.multi_hand_landmarks or []
+    handedness = [c.classification[0].label for c in res.multi_handedness or []][:len(found)]
+    return hands_to_array([hand.landmark for hand in found]), handedness + [None] * (len(found) - len(handedness))
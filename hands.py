@@ -0,0 +1,87 @@
+import time
+from types import SimpleNamespace
+import numpy as np
+
+
+class HandTracker:
+    """Gives every detected hand an ID that stays the same across frames.
+
+    Detections are matched to the known hands greedily by the distance
+    between their landmark centroids (normalized frame coordinates); a
+    handedness mismatch counts as extra distance. Hands not seen for
+    max_age seconds are forgotten. Also keeps the inference cost per number
+    of hands in the frame, to show what each extra hand costs.
+    """
+
+    def __init__(self, max_distance=0.2, max_age=1.0, handedness_penalty=0.1):
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.handedness_penalty = handedness_penalty
+        self.tracks = {}  # id -> {'center', 'handedness', 'seen'}
+        self.next_id = 1
+        self.cost = {}  # hands in frame -> [total seconds, inferences]
+
+    def update(self, points, handedness, now):
+        """Match (N,21,3) landmarks to hand IDs, returns (ids, expired_ids)"""
+        centers = points[:, :, :2].mean(axis=1) if len(points) else np.empty((0, 2))
+        known = list(self.tracks)
+        pairs = []
+        for i, hand_id in enumerate(known):
+            track = self.tracks[hand_id]
+            dist = np.linalg.norm(centers - track['center'], axis=1)
+            for j, d in enumerate(dist):
+                if handedness[j] != track['handedness']:
+                    d += self.handedness_penalty
+                if d <= self.max_distance:
+                    pairs.append((d, hand_id, j))
+
+        ids = [None] * len(centers)
+        used = set()
+        for d, hand_id, j in sorted(pairs):
+            if hand_id in used or ids[j] is not None:
+                continue
+            ids[j] = hand_id
+            used.add(hand_id)
+        for j, hand_id in enumerate(ids):
+            if hand_id is None:
+                hand_id = ids[j] = self.next_id
+                self.next_id += 1
+            self.tracks[hand_id] = {'center': centers[j], 'handedness': handedness[j], 'seen': now}
+
+        expired = [hand_id for hand_id, track in self.tracks.items() if now - track['seen'] > self.max_age]
+        for hand_id in expired:
+            del self.tracks[hand_id]
+        return ids, expired
+
+    def record_cost(self, hands, seconds):
+        """Add one inference that found `hands` hands and took `seconds`"""
+        total = self.cost.setdefault(hands, [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+
+    def stats(self):
+        """Tracked hands and average inference cost by number of hands"""
+        avg_ms = {n: total / count * 1000 for n, (total, count) in self.cost.items() if count}
+        counts = sorted(n for n in avg_ms if n > 0)
+        # Marginal cost of each hand beyond the first, from the extremes we have seen
+        per_extra = None
+        if len(counts) > 1:
+            lo, hi = counts[0], counts[-1]
+            per_extra = round((avg_ms[hi] - avg_ms[lo]) / (hi - lo), 2)
+        return {
+            'tracked': [{'id': hand_id, 'handedness': track['handedness']} for hand_id, track in self.tracks.items()],
+            'avg_inference_ms': {str(n): round(ms, 2) for n, ms in sorted(avg_ms.items())},
+            'ms_per_extra_hand': per_extra,
+        }
+
+
+class StubHands:
+    """Stand-in for mp.solutions.hands.Hands that never finds a hand, for load tests without a model"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay  # simulated inference time, seconds
+
+    def process(self, rgb):
+        if self.delay:
+            time.sleep(self.delay)
+        return SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
@@ -0,0 +1,116 @@
+import os
+import struct
+import threading
+import numpy as np
+
+# File layout: 16 byte header (magic, version, record size), then fixed-size records
+MAGIC = b'AIGLMK\x00\x00'
+VERSION = 2
+HEADER = struct.Struct('<8sII')
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),        # capture time, unix seconds
+    ('frame_id', '<u8'),
+    ('run', '<u4'),              # hand IDs start over with every run, (run, hand_id) is unique in a file
+    ('hand_id', '<u4'),
+    ('width', '<u2'),            # frame size the landmarks were normalized to
+    ('height', '<u2'),
+    ('points', '<f4', (21, 3)),  # normalized x, y, z per landmark
+])
+# Version 1 had no run field, still readable
+RECORD_DTYPES = {1: np.dtype([d for d in RECORD_DTYPE.descr if d[0] != 'run']), VERSION: RECORD_DTYPE}
+
+
+class LandmarkRecorder:
+    """Append-only binary log of detected hand landmarks, one record per hand per frame.
+
+    Records are fixed size, so a recording can be memory-mapped as one
+    numpy array by load_recording() however large it gets. Writes go
+    through a buffered file; a crash loses at most the unflushed tail,
+    and a partially written last record is ignored when loading.
+    start_run() is called whenever hand IDs start over (a new pipeline
+    run), recording continues after the last run already in the file.
+    """
+
+    def __init__(self, path, flush_every=256):
+        self.path = path
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.run = 0
+        if not new:
+            if check_header(path) != VERSION:
+                raise ValueError(f"{path}: recorded by an older version, record to a new file")
+            # A record torn by a crash would shift everything appended after it
+            size = os.path.getsize(path)
+            complete = HEADER.size + (size - HEADER.size) // RECORD_DTYPE.itemsize * RECORD_DTYPE.itemsize
+            if complete < size:
+                print(f"{path}: dropping {size - complete} bytes of an incomplete last record")
+                os.truncate(path, complete)
+            existing = load_recording(path)
+            if len(existing):
+                self.run = int(existing[-1]['run'])
+            del existing
+        self.file = open(path, 'ab')
+        if new:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize))
+        self.records = 0
+        self._unflushed = 0
+
+    def start_run(self):
+        """Hand IDs start over from here, returns the new run number"""
+        with self.lock:
+            self.run += 1
+            return self.run
+
+    def record(self, frame_id, timestamp, hand_ids, points, shape):
+        """Append the (N,21,3) points of the hands found in one frame captured at timestamp"""
+        if not len(points):
+            return
+        rows = np.zeros(len(points), dtype=RECORD_DTYPE)
+        rows['timestamp'] = timestamp
+        rows['frame_id'] = frame_id
+        rows['run'] = self.run
+        rows['hand_id'] = hand_ids
+        rows['height'], rows['width'] = shape[0], shape[1]
+        rows['points'] = points
+        with self.lock:
+            self.file.write(rows.tobytes())
+            self.records += len(rows)
+            self._unflushed += len(rows)
+            if self._unflushed >= self.flush_every:
+                self.file.flush()
+                self._unflushed = 0
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def stats(self):
+        """Counters for the status endpoint"""
+        return {'path': self.path, 'records': self.records, 'run': self.run}
+
+
+def check_header(path):
+    """Validate the header of a recording, returns its version"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path}: not a landmark recording (file too short)")
+    magic, version, record_size = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a landmark recording")
+    if version not in RECORD_DTYPES or record_size != RECORD_DTYPES[version].itemsize:
+        raise ValueError(f"{path}: unsupported recording version {version}")
+    return version
+
+
+def load_recording(path):
+    """Memory-map a recording as a structured array of RECORD_DTYPE (nothing is read up front)
+
+    Version 1 recordings have no 'run' field.
+    """
+    dtype = RECORD_DTYPES[check_header(path)]
+    count = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER.size, shape=(count,))
@@ -0,0 +1,294 @@
+"""Load test for Camera.py: synthetic frames, stub detector, concurrent viewers and pollers
+
+    python loadtest.py --readers 10 --pollers 5 --out results.json
+    python loadtest.py --readers 10 --pollers 5 --compare results.json
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BOUNDARY = b'--frame'
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def process_cpu_seconds(pid):
+    """utime + stime of a process from /proc, None where that is not available"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def captured_frames(base_url):
+    """frames_captured_total from /metrics"""
+    with urllib.request.urlopen(base_url + '/metrics', timeout=5) as r:
+        for line in r.read().decode().splitlines():
+            if line.startswith('ai_guard_frames_captured_total '):
+                return int(float(line.split()[1]))
+    return 0
+
+
+class StreamReader(threading.Thread):
+    """One /video_feed viewer, counts the MJPEG parts it receives"""
+
+    def __init__(self, host, port, query, stop):
+        super().__init__(daemon=True)
+        self.host, self.port, self.query, self.stop = host, port, query, stop
+        self.frames = 0
+        self.bytes = 0
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    def run(self):
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+            conn.request('GET', '/video_feed' + self.query)
+            response = conn.getresponse()
+            self.started = time.time()
+            tail = b''
+            while not self.stop.is_set():
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                self.bytes += len(chunk)
+                data = tail + chunk
+                self.frames += data.count(BOUNDARY)
+                # Keep enough of the end to catch a boundary split across reads, but not count it twice
+                tail = data[-(len(BOUNDARY) - 1):]
+            conn.close()
+        except (OSError, http.client.HTTPException) as e:
+            self.error = str(e)
+        self.finished = time.time()
+
+
+class Poller(threading.Thread):
+    """Polls /api/status and /events on one keep-alive connection, recording latencies"""
+
+    def __init__(self, host, port, interval, stop):
+        super().__init__(daemon=True)
+        self.host, self.port, self.interval, self.stop = host, port, interval, stop
+        self.latencies = {'/api/status': [], '/events': []}
+        self.errors = 0
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+        since = 0
+        while not self.stop.is_set():
+            for path in self.latencies:
+                url = path + (f'?since={since}' if path == '/events' else '')
+                start = time.perf_counter()
+                try:
+                    conn.request('GET', url)
+                    response = conn.getresponse()
+                    response.read()
+                    if path == '/events':
+                        since = int(response.getheader('X-Last-Seq') or since)
+                except (OSError, http.client.HTTPException, ValueError):
+                    self.errors += 1
+                    conn.close()
+                    conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+                    continue
+                self.latencies[path].append(time.perf_counter() - start)
+            self.stop.wait(self.interval)
+        conn.close()
+
+
+def measure(base_url, pid, seconds):
+    """Capture FPS and process CPU over `seconds`"""
+    frames0, cpu0, t0 = captured_frames(base_url), process_cpu_seconds(pid), time.time()
+    time.sleep(seconds)
+    frames1, cpu1, t1 = captured_frames(base_url), process_cpu_seconds(pid), time.time()
+    elapsed = t1 - t0
+    return {
+        'capture_fps': round((frames1 - frames0) / elapsed, 2),
+        'cpu_percent': round((cpu1 - cpu0) / elapsed * 100, 1) if cpu0 is not None and cpu1 is not None else None,
+    }
+
+
+def run_benchmark(args):
+    base_url = f'http://127.0.0.1:{args.port}'
+    cmd = [sys.executable, os.path.join(HERE, 'Camera.py'), '--source', 'synthetic', '--detector', 'stub',
+           '--stub-delay', str(args.stub_delay), '--port', str(args.port), '--width', str(args.width),
+           '--height', str(args.height), '--fps', str(args.fps), '--no-clips'] + args.app_args
+    if args.async_server:
+        cmd.append('--async-server')
+    print("Starting:", ' '.join(cmd))
+    app = subprocess.Popen(cmd, stdout=subprocess.DEVNULL if not args.verbose else None,
+                           stderr=subprocess.DEVNULL if not args.verbose else None)
+    try:
+        # Wait for the first frame
+        deadline = time.time() + args.startup_timeout
+        while True:
+            try:
+                with urllib.request.urlopen(base_url + '/api/ready', timeout=2) as r:
+                    if r.status == 200:
+                        break
+            except OSError:
+                pass
+            if time.time() > deadline or app.poll() is not None:
+                raise RuntimeError("Camera.py did not become ready")
+            time.sleep(0.2)
+
+        time.sleep(args.warmup)
+        print(f"Baseline: no clients for {args.duration}s")
+        baseline = measure(base_url, app.pid, args.duration)
+
+        stop = threading.Event()
+        readers = [StreamReader('127.0.0.1', args.port, args.query, stop) for _ in range(args.readers)]
+        pollers = [Poller('127.0.0.1', args.port, args.poll_interval, stop) for _ in range(args.pollers)]
+        for client in readers + pollers:
+            client.start()
+        time.sleep(args.warmup)
+        print(f"Load: {args.readers} stream readers, {args.pollers} pollers for {args.duration}s")
+        frames_before = [r.frames for r in readers]
+        start = time.time()
+        loaded = measure(base_url, app.pid, args.duration)
+        elapsed = time.time() - start
+        reader_fps = [(r.frames - before) / elapsed for r, before in zip(readers, frames_before)]
+        stop.set()
+        for client in readers + pollers:
+            client.join(timeout=5)
+    finally:
+        app.terminate()
+        try:
+            app.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            app.kill()
+
+    clients = args.readers + args.pollers
+    latency = {}
+    for path in ('/api/status', '/events'):
+        values = [v for p in pollers for v in p.latencies[path]]
+        latency[path] = {'requests': len(values),
+                         'p50_ms': round(percentile(values, 0.5) * 1000, 2),
+                         'p99_ms': round(percentile(values, 0.99) * 1000, 2)}
+    cpu_per_client = None
+    if clients and baseline['cpu_percent'] is not None and loaded['cpu_percent'] is not None:
+        cpu_per_client = round((loaded['cpu_percent'] - baseline['cpu_percent']) / clients, 2)
+
+    return {
+        'timestamp': time.time(),
+        'version': git_version(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        'baseline': baseline,
+        'load': loaded,
+        'capture_fps_degradation_percent': round(
+            (1 - loaded['capture_fps'] / baseline['capture_fps']) * 100, 1) if baseline['capture_fps'] else None,
+        'stream_fps': {
+            'min': round(min(reader_fps), 2) if reader_fps else 0.0,
+            'mean': round(sum(reader_fps) / len(reader_fps), 2) if reader_fps else 0.0,
+            'max': round(max(reader_fps), 2) if reader_fps else 0.0,
+            'per_client': [round(fps, 2) for fps in reader_fps],
+        },
+        'stream_errors': sum(1 for r in readers if r.error),
+        'poll_errors': sum(p.errors for p in pollers),
+        'cpu_percent_per_client': cpu_per_client,
+        'latency': latency,
+    }
+
+
+def git_version():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# (name, path into the result, True if higher is better)
+COMPARED = [
+    ('capture fps under load', ('load', 'capture_fps'), True),
+    ('mean stream fps', ('stream_fps', 'mean'), True),
+    ('min stream fps', ('stream_fps', 'min'), True),
+    ('cpu % per client', ('cpu_percent_per_client',), False),
+    ('/api/status p99 ms', ('latency', '/api/status', 'p99_ms'), False),
+    ('/events p99 ms', ('latency', '/events', 'p99_ms'), False),
+]
+
+
+def lookup(result, path):
+    for key in path:
+        if not isinstance(result, dict) or result.get(key) is None:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(old, new, tolerance):
+    """Print old vs new, returns the names of metrics that got worse by more than tolerance"""
+    regressions = []
+    print(f"{'metric':26s} {'old':>10s} {'new':>10s} {'change':>8s}")
+    for name, path, higher_is_better in COMPARED:
+        a, b = lookup(old, path), lookup(new, path)
+        if a is None or b is None:
+            continue
+        change = (b - a) / abs(a) if a else 0.0
+        worse = -change if higher_is_better else change
+        flag = '  REGRESSION' if worse > tolerance else ''
+        print(f"{name:26s} {a:10.2f} {b:10.2f} {change * 100:7.1f}%{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test Camera.py with a synthetic source and a stub detector")
+    ap.add_argument("--readers", type=int, default=10, help="Concurrent /video_feed readers (default: 10)")
+    ap.add_argument("--pollers", type=int, default=5, help="Concurrent /api/status + /events pollers (default: 5)")
+    ap.add_argument("--poll-interval", type=float, default=0.5, help="Seconds between a poller's rounds (default: 0.5)")
+    ap.add_argument("--query", default="", help="Query string for the stream readers, e.g. '?width=320'")
+    ap.add_argument("--duration", type=float, default=10.0, help="Seconds per measurement phase (default: 10)")
+    ap.add_argument("--warmup", type=float, default=2.0, help="Seconds to settle before measuring (default: 2)")
+    ap.add_argument("--port", type=int, default=5599)
+    ap.add_argument("--width", type=int, default=640)
+    ap.add_argument("--height", type=int, default=480)
+    ap.add_argument("--fps", type=int, default=15)
+    ap.add_argument("--stub-delay", type=float, default=0.02, help="Simulated inference time in seconds (default: 0.02)")
+    ap.add_argument("--async-server", action="store_true", help="Run the app with --async-server")
+    ap.add_argument("--startup-timeout", type=float, default=60.0)
+    ap.add_argument("--verbose", action="store_true", help="Show the app's output")
+    ap.add_argument("--out", help="Write the results to this JSON file")
+    ap.add_argument("--compare", metavar="OLD_JSON", help="Compare with an earlier result, exit 1 on regressions")
+    ap.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression for --compare (default: 0.1)")
+    ap.add_argument("app_args", nargs=argparse.REMAINDER, help="Extra Camera.py arguments after --")
+    args = ap.parse_args()
+    if args.app_args[:1] == ['--']:
+        args.app_args = args.app_args[1:]
+
+    try:
+        result = run_benchmark(args)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+    print(json.dumps({k: v for k, v in result.items() if k != 'config'}, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        regressions = compare(old, result, args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,152 +1,352 @@
+import time
+STARTED_AT = time.time()  # before the heavy imports, for the startup timings
+
 import cv2
 import sys
 import argparse
 import os
-import time
+import json
 import threading
-from flask import Flask, Response, jsonify
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import mediapipe as mp
+from streaming import FrameHub, profile_args
+from pipeline import Pipeline
+from gestures import fist_mask, hand_results
+from hands import HandTracker
+from workers import InferencePool
+from landmarks import LandmarkRecorder
+from asyncserver import AsyncServer
+from sources import open_source, CompressedFrame, as_image, capture_time
+from roi import RoiTracker
+from metrics import metrics
+from events import EventLog, parse_cursor
+from buffers import FramePool
+from tracing import TraceRecorder
 
 app = Flask(__name__)
 CORS(app)
 
 # Shared state
-events = []
-events_lock = threading.Lock()
-latest_frame = None
-frame_lock = threading.Lock()
-
-def open_usb(index, width, height, fps):
-    cap = cv2.VideoCapture(index, cv2.CAP_V4L2)
-    if not cap.isOpened():
-        return None
-    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-    cap.set(cv2.CAP_PROP_FPS, fps)
-    ok, _ = cap.read()
-    if not ok:
-        cap.release()
-        return None
-    return cap
-
-def is_fist(landmarks, h, w):
-    tips = [8, 12, 16, 20]
-    pips = [6, 10, 14, 18]
-    folded = sum(1 for t, p in zip(tips, pips) if landmarks[t].y * h > landmarks[p].y * h)
-    return folded == 4
-
-def generate_frames():
-    while True:
-        with frame_lock:
-            if latest_frame is not None:
-                ret, buffer = cv2.imencode('.jpg', latest_frame)
-                if ret:
-                    yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-        time.sleep(0.033)
+event_log = EventLog(maxlen=1000)
+stream_hub = FrameHub()
+frame_pool = FramePool(size=8)  # the camera reads into reused buffers, no per-frame allocation
+pipeline = None
+roi = None  # RoiTracker when running with --roi
+hand_tracker = HandTracker()  # stable hand IDs and inference cost per hand count
+inference_pool = None  # InferencePool with --workers
+landmark_recorder = None  # LandmarkRecorder with --record-landmarks
+tracer = None  # TraceRecorder with --trace
+startup = {}  # startup timings, filled in once the first frame is captured
+
+# Last camera index that worked, tried first on the next start instead of probing
+CAMERA_CACHE_PATH = os.environ.get('CAMERA_CACHE_PATH',
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), 'camera_cache.json'))
+
+def fist_hands(points, h):
+    # Strict fist: every tip below its pip (no margin), for all (N,21,3) hands at once
+    if not len(points):
+        return []
+    return fist_mask(points, h, margin=0.0)
+
+def generate_frames(width=None, quality=None, max_fps=None):
+    return stream_hub.stream(width, quality, max_fps)
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(generate_frames(**profile_args(request.args)), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/events')
 def get_events():
-    with events_lock:
-        result = list(events)
-        events.clear()
-    return jsonify(result)
+    since = parse_cursor(request.args.get('since'))
+    result = [dict(data, seq=seq) for seq, _, data in event_log.since(since or 0, kind='event')]
+    response = jsonify(result)
+    response.headers['X-Last-Seq'] = str(event_log.last_seq)
+    return response
+
+@app.route('/events/stream')
+def stream_events():
+    since = parse_cursor(request.headers.get('Last-Event-ID'))
+    if since is None:
+        since = parse_cursor(request.args.get('since'))
+    return Response(event_log.stream(since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/status')
+def api_status():
+    return jsonify(status_data())
+
+@app.route('/api/ready')
+def api_ready():
+    ready = 'time_to_first_frame' in startup
+    return jsonify({'ready': ready, 'startup': startup}), 200 if ready else 503
 
-def run_server(port):
-    app.run(host='0.0.0.0', port=port, threaded=True)
+def status_data():
+    return {
+        'pipeline': pipeline.stats() if pipeline else {},
+        'stream': stream_hub.stats(),
+        'roi': roi.stats() if roi else {},
+        'hand_tracking': hand_tracker.stats(),
+        'workers': inference_pool.stats() if inference_pool else {},
+        'buffers': frame_pool.stats(),
+        'trace': tracer.stats() if tracer else {},
+        'startup': startup
+    }
+
+@app.route('/api/trace')
+def api_trace():
+    if tracer is None:
+        return jsonify({'error': 'tracing is off, start with --trace N'}), 404
+    return jsonify(tracer.export(parse_cursor(request.args.get('frame_id'))))
+
+@app.route('/api/trace/summary')
+def api_trace_summary():
+    if tracer is None:
+        return jsonify({'error': 'tracing is off, start with --trace N'}), 404
+    return jsonify(tracer.summary())
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def async_routes():
+    def status(query):
+        return 200, json.dumps(status_data()).encode(), None
+
+    def ready(query):
+        ready = 'time_to_first_frame' in startup
+        return 200 if ready else 503, json.dumps({'ready': ready, 'startup': startup}).encode(), None
+
+    def trace(query):
+        if tracer is None:
+            return 404, b'{"error": "tracing is off, start with --trace N"}', None
+        return 200, json.dumps(tracer.export(parse_cursor(query.get('frame_id')))).encode(), None
+
+    def trace_summary(query):
+        if tracer is None:
+            return 404, b'{"error": "tracing is off, start with --trace N"}', None
+        return 200, json.dumps(tracer.summary()).encode(), None
+
+    return {'/api/status': status, '/api/ready': ready, '/api/trace': trace, '/api/trace/summary': trace_summary}
+
+def run_server(port, use_async=False):
+    if use_async:
+        # Viewers are coroutines woken by new frames / events instead of one thread each
+        AsyncServer(stream_hub, event_log, async_routes()).run(port=port)
+    else:
+        app.run(host='0.0.0.0', port=port, threaded=True)
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--index", type=int, default=-1)
+    ap.add_argument("--source", default="usb",
+                    help="Frame source: usb, usb:N, video:PATH, images:DIR or synthetic (default: usb)")
+    ap.add_argument("--pace", choices=["realtime", "fast"], default="realtime",
+                    help="Offline sources: play at source frame rate or as fast as possible")
+    ap.add_argument("--loop", action="store_true", help="Offline sources: restart at end of input")
+    ap.add_argument("--max-frames", type=int, default=0, help="Offline sources: stop after N frames (0 = no limit)")
+    ap.add_argument("--passthrough", action="store_true",
+                    help="Stream the camera's own MJPEG frames without decode/re-encode, decode only for inference")
     ap.add_argument("--width", type=int, default=1280)
     ap.add_argument("--height", type=int, default=720)
     ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--max-hands", type=int, default=1, help="Detect and track up to N hands (default: 1)")
+    ap.add_argument("--workers", type=int, default=0, help="Run inference in N worker processes over shared memory (default: 0 = in this process)")
+    ap.add_argument("--record-landmarks", metavar="PATH", help="Append the landmarks of every detected hand to this file (see reclassify.py)")
+    ap.add_argument("--roi", action="store_true", help="Run inference on a crop around the last hand, full frame only after a miss (single hand only)")
+    ap.add_argument("--roi-size", type=int, default=256, help="ROI mode: crop is resized to N x N pixels (default: 256)")
+    ap.add_argument("--roi-expand", type=float, default=1.8, help="ROI mode: crop size relative to the hand bounding box (default: 1.8)")
+    ap.add_argument("--search-width", type=int, default=640, help="ROI mode: full-frame searches run on a copy downscaled to this width (default: 640)")
     ap.add_argument("--port", type=int, default=5500)
+    ap.add_argument("--async-server", action="store_true", help="Serve with a single asyncio thread instead of Flask's thread per connection")
+    ap.add_argument("--trace", type=int, default=0, metavar="SPANS",
+                    help="Keep the last N per-frame stage timings for /api/trace (Chrome trace JSON, default: 0 = off)")
+    ap.add_argument("--trace-file", help="With --trace: also write the trace to this file when the source ends")
     ap.add_argument("--no-gui", action="store_true")
     args = ap.parse_args()
+    if args.roi and args.max_hands > 1:
+        print("ROI mode tracks a single hand, ignoring --roi with --max-hands > 1")
+        args.roi = False
+    if args.roi and args.workers:
+        print("ROI mode keeps tracking state in this process, ignoring --roi with --workers")
+        args.roi = False
 
-    global latest_frame
+    global pipeline, roi, inference_pool, landmark_recorder, tracer
 
     gui_allowed = (not args.no_gui) and bool(os.environ.get("DISPLAY"))
+    if args.record_landmarks:
+        landmark_recorder = LandmarkRecorder(args.record_landmarks)
+        landmark_recorder.start_run()
+    if args.trace:
+        tracer = TraceRecorder(args.trace)
+        stream_hub.trace = tracer.tracer('Camera 1')
+    trace = tracer.tracer('Camera 1') if tracer else None
 
-    if args.index >= 0:
-        cap = open_usb(args.index, args.width, args.height, args.fps)
-        if cap is None:
-            print(f"Error: Failed to open camera {args.index}")
-            sys.exit(1)
-    else:
-        cap = None
-        for i in [0, 1, 2, 3]:
-            print(f"Trying camera index {i}...")
-            cap = open_usb(i, args.width, args.height, args.fps)
-            if cap:
-                print(f"Opened camera {i}")
-                break
-        if cap is None:
-            print("Error: Could not open any USB camera.")
-            sys.exit(1)
-
-    # Start Flask server in background
-    server_thread = threading.Thread(target=run_server, args=(args.port,), daemon=True)
+    # Server first, so /api/ready answers while the camera and the model are still coming up
+    stream_hub.start()
+    server_thread = threading.Thread(target=run_server, args=(args.port, args.async_server), daemon=True)
     server_thread.start()
     print(f"Server running on port {args.port}")
 
-    mp_hands = mp.solutions.hands
-    hands = mp_hands.Hands(model_complexity=0, max_num_hands=1,
-                           min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    # MediaPipe takes seconds to import and set up, so it loads while the camera opens
+    model = {}
+
+    def load_model():
+        load_start = time.time()
+        if args.workers:
+            # Each worker process loads its own MediaPipe, landmarks come back to handle_hands
+            model['pool'] = InferencePool(args.workers, lambda *result: on_result(*result),
+                                          {'max_hands': args.max_hands}).start()
+            model['roi'] = model['hands'] = None
+            # Loaded once every worker has its model up, like the in-process path
+            if not model['pool'].wait_started():
+                print("Inference workers still loading, starting without them")
+            startup['model_load_seconds'] = round(time.time() - load_start, 3)
+            return
+        model['pool'] = None
+        import mediapipe as mp
+        mp_hands = mp.solutions.hands
+
+        def make_hands():
+            return mp_hands.Hands(model_complexity=0, max_num_hands=args.max_hands,
+                                  min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+        # ROI mode runs MediaPipe on a small crop around the last hand instead of the full frame
+        model['roi'] = RoiTracker(make_hands, args.roi_size, args.roi_expand, args.search_width) if args.roi else None
+        model['hands'] = None if model['roi'] else make_hands()
+        startup['model_load_seconds'] = round(time.time() - load_start, 3)
+
+    loader = threading.Thread(target=load_model, daemon=True)
+    loader.start()
+
+    cap = open_source(args.source, args.index, args.width, args.height, args.fps,
+                      pace=args.pace, loop=args.loop, max_frames=args.max_frames,
+                      passthrough=args.passthrough, cache_path=CAMERA_CACHE_PATH)
+    if cap is None:
+        sys.exit(1)
+    startup['camera_open_seconds'] = round(time.time() - STARTED_AT, 3)
+
+    loader.join()
+    roi, hands, inference_pool = model['roi'], model['hands'], model['pool']
 
     print("Running. Ctrl+C to stop (or ESC in GUI mode).")
-    fist_state = False
-
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            print("Failed to read frame")
-            break
-
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        res = hands.process(rgb)
-        h, w = frame.shape[:2]
-
-        label = ""
-        if res.multi_hand_landmarks:
-            lms = res.multi_hand_landmarks[0].landmark
-            if is_fist(lms, h, w):
-                label = "ROCK (FIST)"
-                if not fist_state:
-                    print("ROCK detected")
-                    with events_lock:
-                        events.append({
-                            "event_type": "Fist Detected",
-                            "description": "Fist gesture detected",
-                            "camera_id": "Camera 1",
-                            "timestamp": time.time()
-                        })
-                fist_state = True
-            else:
-                fist_state = False
-        else:
-            fist_state = False
-
-        if label:
-            cv2.putText(frame, label, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
-
-        with frame_lock:
-            latest_frame = frame.copy()
+    state = {'fists': set(), 'label': ''}  # ids of the hands currently making a fist
+    rgb_buffer = None  # reused by cvtColor, only the inference stage touches it
+
+    def infer(frame_id, frame):
+        nonlocal rgb_buffer
+        if isinstance(frame, CompressedFrame):
+            with metrics.timer('imdecode'):
+                frame = frame.decode()
+        if inference_pool:
+            # Worker processes do the rest, results come back through handle_hands in frame order
+            return inference_pool.submit(frame_id, frame)
+        with metrics.timer('cvt_color'):
+            rgb = rgb_buffer = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_buffer)
+        infer_start = time.perf_counter()
+        with metrics.timer('hands_process'):
+            res = roi.process(rgb) if roi else hands.process(rgb)
+        points, handedness = hand_results(res)
+        handle_hands(frame_id, points, handedness, frame.shape, time.perf_counter() - infer_start)
+
+    def handle_hands(frame_id, points, handedness, shape, seconds):
+        h = shape[0]
+        classify_start = time.time()
+        with metrics.timer('detect_gesture'):
+            # All hands are checked in one batched call
+            fists = fist_hands(points, h)
+        now = time.time()
+        if trace:
+            trace(frame_id, 'classify', classify_start, now)
+        captured_at = pipeline.captured_at(frame_id) or now
+        hand_ids, _ = hand_tracker.update(points, handedness, now)
+        hand_tracker.record_cost(len(points), seconds)
+        if landmark_recorder:
+            landmark_recorder.record(frame_id, captured_at, hand_ids, points, shape)
+
+        fisting = set()
+        for hand_id, hand, fist in zip(hand_ids, handedness, fists):
+            if not fist:
+                continue
+            fisting.add(hand_id)
+            if hand_id not in state['fists']:
+                print(f"ROCK detected (hand {hand_id})")
+                event_log.append({
+                    "event_type": "Fist Detected",
+                    "description": "Fist gesture detected",
+                    "camera_id": "Camera 1",
+                    "hand_id": hand_id,
+                    "handedness": hand,
+                    "frame_id": frame_id,
+                    "captured_at": captured_at,
+                    "timestamp": now
+                })
+                if trace:
+                    trace(frame_id, 'event', captured_at, time.time())
+        state['fists'] = fisting
 
+        label = "ROCK (FIST)" if fisting else ""
+        if len(hand_ids) > 1 and fisting:
+            label += " " + " ".join(f"#{hand_id}" for hand_id in sorted(fisting))
+        if label != state['label']:
+            event_log.append({"gesture": 'rock' if label else None, "label": label,
+                              "hands": sorted(fisting), "camera_id": "Camera 1", "frame_id": frame_id,
+                              "captured_at": captured_at, "timestamp": now}, kind='gesture')
+        state['label'] = label
+
+    def on_result(frame_id, *result):
+        # Worker results: inference of the frame only counts as done once they are handled
+        try:
+            handle_hands(frame_id, *result)
+        finally:
+            pipeline.result(frame_id)
+
+    def publish(frame_id, frame):
+        label = state['label']
+        shown = frame
+        # Passthrough frames are streamed untouched, dashboards get the label from /events/stream
+        if label and not isinstance(frame, CompressedFrame):
+            # Draw on a pooled copy, the inference stage may still be reading this frame
+            shown = frame_pool.copy(frame)
+            cv2.putText(shown.image, label, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
+
+        stream_hub.publish(shown, frame_id)
+
+        keep_going = True
         if gui_allowed:
-            cv2.imshow("USB Camera", frame)
-            if cv2.waitKey(1) & 0xFF == 27:
-                break
+            cv2.imshow("USB Camera", as_image(shown))
+            keep_going = cv2.waitKey(1) & 0xFF != 27
+        if shown is not frame:
+            shown.release()  # the hub keeps its own reference
+        return keep_going
+
+    def read_frame():
+        ok, frame = frame_pool.read(cap)
+        if ok and 'time_to_first_frame' not in startup:
+            startup['time_to_first_frame'] = round(time.time() - STARTED_AT, 3)
+            print(f"First frame after {startup['time_to_first_frame']:.2f}s")
+        return ok, frame
 
-    cap.release()
-    if gui_allowed:
-        cv2.destroyAllWindows()
+    # Capture and inference run in background stages, publish (and GUI) stays on this thread
+    pipeline = Pipeline(read_frame, infer, publish,
+                        infer_ready=inference_pool.wait_ready if inference_pool else None,
+                        capture_time=lambda: capture_time(cap), trace=trace,
+                        deferred_results=inference_pool is not None)
+    try:
+        pipeline.run()
+    finally:
+        # Also after a failed stage, run() re-raises its error once everything is stopped
+        if tracer and args.trace_file:
+            tracer.save(args.trace_file)
+            print(f"Trace written to {args.trace_file}")
+
+        if inference_pool:
+            inference_pool.close()
+        if landmark_recorder:
+            landmark_recorder.close()
+
+        cap.release()
+        if gui_allowed:
+            cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,126 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, shared by all stage histograms
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, observe() is a bisect and three adds"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket (like Prometheus histogram_quantile)"""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if seen + c >= rank and c > 0:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Per-stage latency histograms and counters, rendered in Prometheus text format"""
+
+    def __init__(self, prefix='ai_guard'):
+        self.prefix = prefix
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        hist = self.stages.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self.stages.setdefault(stage, Histogram())
+        hist.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the body of a with block as one observation of stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    @contextmanager
+    def timed_lock(self, lock, stage):
+        """Acquire lock and record how long we waited for it"""
+        start = time.perf_counter()
+        with lock:
+            self.observe(stage, time.perf_counter() - start)
+            yield
+
+    def quantiles(self):
+        """{stage: {'p50': ms, 'p95': ms, 'p99': ms}} for status pages"""
+        return {stage: {f'p{int(q * 100)}': round(hist.quantile(q) * 1000, 2) for q in QUANTILES}
+                for stage, hist in sorted(self.stages.items())}
+
+    def render(self):
+        """Prometheus text exposition format"""
+        p = self.prefix
+        lines = [f'# HELP {p}_stage_seconds Time spent per pipeline stage',
+                 f'# TYPE {p}_stage_seconds histogram']
+        for stage, hist in sorted(self.stages.items()):
+            with hist._lock:
+                counts = list(hist.counts)
+                total, hist_sum = hist.count, hist.sum
+            cumulative = 0
+            for bound, c in zip(hist.buckets, counts):
+                cumulative += c
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {total}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {hist_sum:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {total}')
+
+        lines += [f'# HELP {p}_stage_quantile_seconds Estimated stage latency quantiles',
+                  f'# TYPE {p}_stage_quantile_seconds gauge']
+        for stage, hist in sorted(self.stages.items()):
+            for q in QUANTILES:
+                lines.append(f'{p}_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} {hist.quantile(q):.6f}')
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f'# TYPE {p}_{name} counter')
+                typed.add(name)
+            label_str = ','.join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f'{p}_{name}{{{label_str}}} {value}' if label_str else f'{p}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry used by all modules
+metrics = Metrics()
@@ -0,0 +1,69 @@
+import cv2
+
+
+class MotionDetector:
+    """Cheap motion check by differencing downscaled grayscale frames"""
+
+    def __init__(self, width=160, pixel_threshold=25, area_threshold=0.005):
+        self.width = width
+        self.pixel_threshold = pixel_threshold  # per-pixel gray level change that counts
+        self.area_threshold = area_threshold    # fraction of changed pixels that counts as motion
+        self.prev = None
+        self.level = 0.0
+
+    def update(self, frame):
+        """Compare frame (BGR or already grayscale) with the previous one, returns True if there was motion"""
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(h * self.width // w, 1)), interpolation=cv2.INTER_AREA)
+        gray = small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        prev, self.prev = self.prev, gray
+        if prev is None:
+            return True  # Nothing to compare with yet, let inference have a look
+
+        diff = cv2.absdiff(gray, prev)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        self.level = cv2.countNonZero(mask) / mask.size
+        return self.level >= self.area_threshold
+
+
+class InferenceScheduler:
+    """Decides when hand inference runs based on recent motion.
+
+    While there is motion (and for `hold` seconds after it stops) inference
+    runs every active_interval seconds (0 = every frame); otherwise it falls
+    back to the slow idle_interval cadence.
+    """
+
+    def __init__(self, idle_interval=2.0, active_interval=0.0, hold=1.5):
+        self.idle_interval = idle_interval
+        self.active_interval = active_interval
+        self.hold = hold
+        self.last_motion = 0.0
+        self.last_run = 0.0
+        self.active = False
+        self.runs = 0
+        self.skipped = 0
+
+    def should_run(self, now, motion):
+        if motion:
+            self.last_motion = now
+        self.active = now - self.last_motion <= self.hold
+        interval = self.active_interval if self.active else self.idle_interval
+        if now - self.last_run >= interval:
+            self.last_run = now
+            self.runs += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        """Counters for the status endpoint"""
+        total = self.runs + self.skipped
+        return {
+            'active': self.active,
+            'inferences_run': self.runs,
+            'inferences_skipped': self.skipped,
+            'skip_ratio': round(self.skipped / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,267 @@
+import itertools
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from metrics import metrics
+from buffers import retain, release, unwrap
+
+
+class LatestSlot:
+    """Single-slot handoff between two stages where the newest item always wins.
+
+    put() never blocks: an item the consumer has not picked up yet is
+    replaced and counted as dropped, so a slow consumer always works on the
+    freshest frame instead of a backlog. on_drop(item) is called for every
+    replaced item, e.g. to give its frame buffer back.
+    """
+
+    def __init__(self, name, on_drop=None):
+        self.name = name
+        self.on_drop = on_drop
+        self._item = None
+        self._full = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._full:
+                self.dropped += 1
+                metrics.inc('frames_dropped_total', stage=self.name)
+                if self.on_drop:
+                    self.on_drop(self._item)
+            self._item = item
+            self._full = True
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Take the newest item, returns None on timeout or when closed"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._full or self._closed, timeout)
+            if not self._full:
+                return None
+            item = self._item
+            self._item = None
+            self._full = False
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class Pipeline:
+    """Capture, inference and publish stages joined by latest-wins slots.
+
+    read_frame() -> (ok, frame) runs at camera rate in the capture stage.
+    infer(frame_id, frame) and publish(frame_id, frame) each run in their
+    own stage and always receive the newest captured frame; frames a stage
+    was too slow to pick up are counted as dropped. infer may return False
+    when it decided to skip a frame, publish may return False to stop the
+    pipeline.
+
+    Pooled frames (see buffers.py) are reference counted across the
+    stages: each slot holds a reference until its stage is done. infer gets
+    the bare pixels and must not keep them after returning; publish gets
+    the frame as captured and retains it if it hands it on.
+
+    infer_ready(), if given, blocks the inference stage until it can take
+    another frame (e.g. a free worker), so it then picks up the newest one.
+    With deferred_results, infer only hands the frame off (to worker
+    processes) and result(frame_id) reports when its result came back; the
+    inference timing and the capture -> gesture latency run until then.
+
+    An exception in any stage stops the whole pipeline instead of leaving
+    the other stages running without it; run() then raises it, so a
+    supervisor sees the camera fail and can restart it.
+
+    Frame IDs come from frame_ids (pass one shared iterator to keep them
+    unique across pipelines); capture_time() may return the driver's
+    capture timestamp of the frame just read, otherwise the end of the read
+    counts. trace(frame_id, stage, start, end), if given, receives the
+    timing of every stage of every frame.
+    """
+
+    def __init__(self, read_frame, infer, publish, infer_interval=0.0, infer_ready=None,
+                 frame_ids=None, capture_time=None, trace=None, deferred_results=False):
+        self.read_frame = read_frame
+        self.infer = infer
+        self.publish = publish
+        self.infer_interval = infer_interval
+        self.infer_ready = infer_ready
+        self.frame_ids = frame_ids if frame_ids is not None else itertools.count(1)
+        self.capture_time = capture_time
+        self.trace = trace
+        self.captured = OrderedDict()  # frame_id -> capture time, for the frames still in flight
+        self.deferred_results = deferred_results
+        self.inferring = OrderedDict()  # frame_id -> (capture time, inference start), deferred results only
+        self._lock = threading.Lock()
+        self.infer_slot = LatestSlot('inference', on_drop=self._drop)
+        self.publish_slot = LatestSlot('publish', on_drop=self._drop)
+        self.frames_captured = 0
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.frames_published = 0
+        self.last_latency = 0.0  # capture -> gesture result, seconds
+        self.error = None  # exception that stopped a stage
+        self._threads = []
+
+    def start(self):
+        """Start the capture and inference stages in background threads"""
+        for name, loop in (('capture', self._capture_loop), ('inference', self._inference_loop)):
+            thread = threading.Thread(target=self._run_stage, args=(name, loop), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def run(self):
+        """Start the pipeline and run the publish stage in the calling thread"""
+        self.start()
+        self._run_stage('publish', self._publish_loop)
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        if self.error is not None:
+            raise self.error
+
+    def _run_stage(self, name, loop):
+        try:
+            loop()
+        except Exception as e:
+            traceback.print_exc()
+            print(f"Pipeline {name} stage failed: {e}")
+            metrics.inc('stage_errors_total', stage=name)
+            if self.error is None:
+                self.error = e
+            self.stop()
+
+    @staticmethod
+    def _drop(item):
+        release(item[2])
+
+    def stop(self):
+        self.infer_slot.close()
+        self.publish_slot.close()
+
+    def captured_at(self, frame_id):
+        """Capture time of a recent frame, None once it has aged out"""
+        return self.captured.get(frame_id)
+
+    def _capture_loop(self):
+        while not self.infer_slot.closed:
+            with metrics.timer('capture'):
+                ok, frame = self.read_frame()
+            if not ok:
+                print("Failed to read frame")
+                break
+            read_end = time.time()
+            captured_at = (self.capture_time() if self.capture_time else None) or read_end
+            frame_id = next(self.frame_ids)
+            self.captured[frame_id] = captured_at
+            if len(self.captured) > 256:
+                self.captured.popitem(last=False)
+            if self.trace:
+                # Driver -> application delivery only, waiting for the next frame is not latency
+                self.trace(frame_id, 'capture', captured_at, read_end)
+            self.frames_captured += 1
+            metrics.inc('frames_captured_total')
+            item = (frame_id, captured_at, frame, read_end)
+            # One buffer reference per slot (the read gave us the first), taken
+            # before either stage can pick the frame up and release it
+            retain(frame)
+            self.infer_slot.put(item)
+            self.publish_slot.put(item)
+        self.stop()
+
+    def _inference_loop(self):
+        last_run = 0.0
+        while True:
+            # Wait out the interval first so we always pick up the freshest frame
+            if self.infer_interval:
+                wait = last_run + self.infer_interval - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+            if self.infer_ready:
+                while not self.infer_ready() and not self.infer_slot.closed:
+                    pass
+            item = self.infer_slot.get()
+            if item is None:
+                break
+            last_run = time.time()
+            frame_id, captured_at, frame, queued_at = item
+            if self.deferred_results:
+                # Noted before the hand-off, the result may be back before infer returns
+                with self._lock:
+                    self.inferring[frame_id] = (captured_at, last_run)
+                    if len(self.inferring) > 256:
+                        self.inferring.popitem(last=False)
+            try:
+                skipped = self.infer(frame_id, unwrap(frame)) is False
+            finally:
+                release(frame)
+            if skipped:
+                with self._lock:
+                    self.inferring.pop(frame_id, None)
+                self.frames_skipped += 1
+                metrics.inc('frames_skipped_total')
+                continue
+            if self.trace:
+                self.trace(frame_id, 'inference_wait', queued_at, last_run)
+            if not self.deferred_results:
+                self._inferred(frame_id, captured_at, last_run)
+
+    def result(self, frame_id):
+        """The result of a frame handed off by infer arrived (deferred_results only)"""
+        with self._lock:
+            entry = self.inferring.pop(frame_id, None)
+        if entry:
+            self._inferred(frame_id, *entry)
+
+    def _inferred(self, frame_id, captured_at, started):
+        end = time.time()
+        metrics.observe('inference', end - started)
+        if self.trace:
+            self.trace(frame_id, 'inference', started, end)
+        self.frames_inferred += 1
+        metrics.inc('frames_processed_total')
+        self.last_latency = end - captured_at
+
+    def _publish_loop(self):
+        while True:
+            item = self.publish_slot.get()
+            if item is None:
+                break
+            frame_id, _, frame, queued_at = item
+            start = time.time()
+            with metrics.timer('publish'):
+                try:
+                    keep_going = self.publish(frame_id, frame)
+                finally:
+                    release(frame)
+            if self.trace:
+                self.trace(frame_id, 'publish_wait', queued_at, start)
+                self.trace(frame_id, 'publish', start, time.time())
+            if keep_going is False:
+                break
+            self.frames_published += 1
+        self.stop()
+
+    def stats(self):
+        """Per-stage counters for the status endpoint"""
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_skipped,
+            'frames_published': self.frames_published,
+            'inference_dropped': self.infer_slot.dropped,
+            'publish_dropped': self.publish_slot.dropped,
+            'capture_to_gesture_ms': round(self.last_latency * 1000, 1),
+        }
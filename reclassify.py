@@ -0,0 +1,125 @@
+"""Re-run the gesture rules over recorded landmarks (see --record-landmarks)
+
+    python reclassify.py landmarks.bin
+    python reclassify.py landmarks.bin --set EXTENDED_CURL=0.35 --compare
+"""
+import argparse
+import json
+import sys
+import time
+import numpy as np
+from gestures import GESTURES, classify_batch, default_thresholds
+from landmarks import load_recording
+
+
+def name(code):
+    return GESTURES[code] or 'none'
+
+
+def classify_recording(records, thresholds=None, chunk=1000000):
+    """Classify every record in chunks, returns (codes, transitions (5,5) counts)"""
+    codes = np.empty(len(records), dtype=np.int8)
+    transitions = np.zeros((len(GESTURES), len(GESTURES)), dtype=np.int64)
+    last = {}  # (run, hand id) key -> code of its last record in the previous chunk
+    for start in range(0, len(records), chunk):
+        part = records[start:start + chunk]
+        part_codes = classify_batch(part['points'], part['height'].astype(np.float64), thresholds)
+        codes[start:start + len(part)] = part_codes
+
+        # Transitions are counted along each hand's own sequence of records, hand IDs repeat across runs
+        hands = part['hand_id'].astype(np.int64)
+        if 'run' in part.dtype.names:
+            hands |= part['run'].astype(np.int64) << 32
+        order = np.argsort(hands, kind='stable')
+        hands_sorted, codes_sorted = hands[order], part_codes[order]
+        same_hand = hands_sorted[1:] == hands_sorted[:-1]
+        prev, cur = codes_sorted[:-1][same_hand], codes_sorted[1:][same_hand]
+        changed = prev != cur
+        np.add.at(transitions, (prev[changed], cur[changed]), 1)
+
+        # Stitch each hand's first record here to its last one in the previous chunk
+        starts = np.flatnonzero(np.r_[True, ~same_hand])
+        ends = np.r_[starts[1:], len(hands_sorted)] - 1
+        for first, final in zip(starts, ends):
+            hand = int(hands_sorted[first])
+            if hand in last and last[hand] != codes_sorted[first]:
+                transitions[last[hand], codes_sorted[first]] += 1
+            last[hand] = int(codes_sorted[final])
+    return codes, transitions
+
+
+def summarize(codes, transitions):
+    counts = np.bincount(codes, minlength=len(GESTURES)) if len(codes) else np.zeros(len(GESTURES), dtype=int)
+    return {
+        'counts': {name(i): int(n) for i, n in enumerate(counts)},
+        'transitions': {f"{name(a)} -> {name(b)}": int(transitions[a, b])
+                        for a, b in zip(*np.nonzero(transitions))},
+    }
+
+
+def parse_overrides(items):
+    overrides = {}
+    for item in items:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"Expected NAME=VALUE, got '{item}'")
+        overrides[key.strip().upper()] = float(value)
+    return overrides
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-run gesture classification over landmark recordings")
+    ap.add_argument("recordings", nargs='+', help="Landmark recording files written with --record-landmarks")
+    ap.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                    help=f"Override a threshold, one of: {', '.join(default_thresholds())}")
+    ap.add_argument("--compare", action="store_true", help="Also classify with the default thresholds and report the differences")
+    ap.add_argument("--chunk", type=int, default=1000000, help="Records classified per batch (default: 1000000)")
+    ap.add_argument("--json", help="Also write the report to this JSON file")
+    args = ap.parse_args()
+
+    try:
+        overrides = parse_overrides(args.set)
+        classify_batch(np.zeros((1, 21, 3), dtype=np.float32), 480, overrides)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+    report = {'thresholds': dict(default_thresholds(), **overrides), 'recordings': {}}
+    for path in args.recordings:
+        try:
+            records = load_recording(path)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        start = time.perf_counter()
+        codes, transitions = classify_recording(records, overrides, args.chunk)
+        elapsed = time.perf_counter() - start
+        result = dict(summarize(codes, transitions), records=len(records),
+                      seconds=round(elapsed, 3), records_per_second=round(len(records) / max(elapsed, 1e-9)))
+
+        if args.compare and overrides:
+            base_codes, base_transitions = classify_recording(records, None, args.chunk)
+            differs = codes != base_codes
+            result['baseline'] = summarize(base_codes, base_transitions)
+            result['changed_records'] = int(differs.sum())
+            result['changes'] = {f"{name(a)} -> {name(b)}": int(n) for (a, b), n in zip(
+                *np.unique(np.stack([base_codes[differs], codes[differs]], axis=1), axis=0, return_counts=True))}
+        report['recordings'][path] = result
+
+        print(f"{path}: {len(records)} records in {elapsed:.2f}s ({result['records_per_second']} records/s)")
+        for gesture, n in result['counts'].items():
+            base = f" (default: {result['baseline']['counts'][gesture]})" if 'baseline' in result else ""
+            print(f"  {gesture:14s} {n}{base}")
+        for transition, n in sorted(result['transitions'].items(), key=lambda item: -item[1]):
+            print(f"  {transition:30s} {n}")
+        if 'changed_records' in result:
+            print(f"  {result['changed_records']} records classified differently than with the defaults")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import time
+import cv2
+
+
+class RoiTracker:
+    """Hand inference on a small crop around the last known hand.
+
+    After a hand has been found, the next frame only runs MediaPipe on a
+    square region around its previous bounding box (expanded by `expand`),
+    resized to input_size x input_size, and the landmarks are mapped back to
+    full-frame normalized coordinates. On a miss it falls back to a
+    full-frame search, which itself runs on a copy downscaled to
+    search_width. Works for one hand (max_num_hands=1).
+    """
+
+    def __init__(self, make_hands, input_size=256, expand=1.8, search_width=640, min_size=64):
+        # Separate MediaPipe instances so crop and full-frame tracking state don't mix
+        self.full_hands = make_hands()
+        self.roi_hands = make_hands()
+        self.input_size = input_size
+        self.expand = expand
+        self.search_width = search_width
+        self.min_size = min_size
+        self.box = None  # (x0, y0, x1, y1) in frame pixels
+        self.roi_hits = 0
+        self.roi_misses = 0
+        self.full_searches = 0
+        self.roi_time = 0.0
+        self.full_time = 0.0
+
+    def process(self, rgb):
+        """Run MediaPipe on the ROI (or the full frame), landmarks come back in full-frame coordinates"""
+        h, w = rgb.shape[:2]
+        if self.box is not None:
+            start = time.perf_counter()
+            res = self._process_roi(rgb, w, h)
+            self.roi_time += time.perf_counter() - start
+            if res.multi_hand_landmarks:
+                self.roi_hits += 1
+                self._update_box(res, w, h)
+                return res
+            # Lost the hand, search the whole frame again
+            self.roi_misses += 1
+            self.box = None
+
+        start = time.perf_counter()
+        res = self.full_hands.process(self._downscale(rgb, w, h))
+        self.full_time += time.perf_counter() - start
+        self.full_searches += 1
+        self._update_box(res, w, h)
+        return res
+
+    def _downscale(self, rgb, w, h):
+        if not self.search_width or w <= self.search_width:
+            return rgb
+        # Landmarks are normalized, so nothing needs mapping back
+        size = (self.search_width, h * self.search_width // w)
+        return cv2.resize(rgb, size, interpolation=cv2.INTER_AREA)
+
+    def _process_roi(self, rgb, w, h):
+        x0, y0, x1, y1 = self.box
+        crop = cv2.resize(rgb[y0:y1, x0:x1], (self.input_size, self.input_size),
+                          interpolation=cv2.INTER_AREA)
+        res = self.roi_hands.process(crop)
+        if res.multi_hand_landmarks:
+            cw, ch = x1 - x0, y1 - y0
+            for hand in res.multi_hand_landmarks:
+                for lm in hand.landmark:
+                    lm.x = (x0 + lm.x * cw) / w
+                    lm.y = (y0 + lm.y * ch) / h
+                    lm.z = lm.z * cw / w  # z uses the same scale as x
+        return res
+
+    def _update_box(self, res, w, h):
+        """Square box around the first hand, expanded and clipped to the frame"""
+        if not res.multi_hand_landmarks:
+            self.box = None
+            return
+        lms = res.multi_hand_landmarks[0].landmark
+        xs = [lm.x * w for lm in lms]
+        ys = [lm.y * h for lm in lms]
+        cx, cy = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+        side = max(max(xs) - min(xs), max(ys) - min(ys)) * self.expand
+        side = int(min(max(side, self.min_size), w, h))
+        x0 = int(min(max(cx - side / 2, 0), w - side))
+        y0 = int(min(max(cy - side / 2, 0), h - side))
+        self.box = (x0, y0, x0 + side, y0 + side)
+
+    def stats(self):
+        """Counters for the status endpoint"""
+        roi_runs = self.roi_hits + self.roi_misses
+        return {
+            'tracking': self.box is not None,
+            'roi_hits': self.roi_hits,
+            'roi_misses': self.roi_misses,
+            'full_searches': self.full_searches,
+            'avg_roi_ms': round(self.roi_time / roi_runs * 1000, 2) if roi_runs else 0.0,
+            'avg_full_ms': round(self.full_time / self.full_searches * 1000, 2) if self.full_searches else 0.0,
+        }
@@ -97,6 +97,41 @@ app.post('/api/log', (req, res) => {
     });
 });
 
+// 1b. Log a Batch of Events
+// Used by the camera service's event shipper to deliver many events in one request.
+// Expected body: { events: [{ event_type, description, camera_id, timestamp }, ...] }
+// timestamp (unix seconds) is kept when present, so replayed events keep their original time.
+app.post('/api/log/batch', (req, res) => {
+    const { events } = req.body;
+
+    if (!Array.isArray(events)) {
+        return res.status(400).json({ error: 'events array is required' });
+    }
+
+    const valid = events.filter(event => event && event.event_type);
+    const sql = `INSERT INTO logs (event_type, timestamp)
+    VALUES (?, COALESCE(datetime(?, 'unixepoch'), CURRENT_TIMESTAMP))`;
+
+    db.serialize(() => {
+        db.run('BEGIN TRANSACTION');
+        const stmt = db.prepare(sql);
+        valid.forEach(event => stmt.run([event.event_type, event.timestamp ?? null]));
+        stmt.finalize();
+        db.run('COMMIT', (err) => {
+            if (err) {
+                db.run('ROLLBACK');
+                res.status(500).json({ error: err.message });
+                return;
+            }
+            res.json({
+                message: 'Log entries created',
+                inserted: valid.length,
+                skipped: events.length - valid.length
+            });
+        });
+    });
+});
+
 // 2. Get All Logs (Paginated)
 // Fetches logs with pagination support.
 // Query params: ?page=1&limit=20
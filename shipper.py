@@ -0,0 +1,311 @@
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class EventShipper:
+    """Ships events to the Node.js backend from a single long-lived thread.
+
+    Events go into a bounded queue and are sent in batches (whichever comes
+    first of batch_size events or batch_interval seconds) to the bulk
+    endpoint over one pooled keep-alive session. Failed sends are retried
+    with exponential backoff; if the backend stays unreachable, batches are
+    appended to a local spool file and replayed once it is back. submit()
+    never blocks the caller and never touches the disk: events that do not
+    fit in the queue are spooled by the sending thread.
+    """
+
+    def __init__(self, base_url, spool_path, max_queue=1000, batch_size=50,
+                 batch_interval=0.5, timeout=2, retries=3, max_backoff=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.timeout = timeout
+        self.retries = retries
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        # Events submitted while the queue was full, spooled by the sending thread
+        self.overflow = deque(maxlen=max_queue)
+        self.spool_lock = threading.Lock()
+        self.bulk_supported = True
+        self.backend_up = True
+        self.backoff = 0.0
+        self.next_replay = 0.0
+        self._thread = None
+        self.trace = None  # trace(frame_id, stage, start, end, camera) for events that carry a frame_id
+
+        self.events_sent = 0
+        self.events_spooled = 0
+        self.events_rejected = 0
+        self.events_lost = 0  # could not be written to the spool either, or overflowed while it was behind
+        self.spool_corrupt = 0  # unreadable spool lines, moved to <spool>.bad
+        self.batches_sent = 0
+        self.send_failures = 0
+        self.last_batch_size = 0
+        self.last_send_ms = 0.0
+        self.total_send_ms = 0.0
+
+    def start(self):
+        """Start the shipping thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, event_data):
+        """Queue an event for shipping; spools it if the queue is full"""
+        try:
+            self.queue.put_nowait(event_data)
+        except queue.Full:
+            if len(self.overflow) == self.overflow.maxlen:
+                # The sending thread is far behind, the oldest overflow event goes
+                self.events_lost += 1
+            self.overflow.append(event_data)
+
+    def _run(self):
+        recovered = False
+        while True:
+            # This is the only sending thread, an error must not end it
+            try:
+                if not recovered:
+                    self._recover_replay_file()
+                    recovered = True
+                self._ship_once()
+            except Exception as e:
+                traceback.print_exc()
+                print(f"Event shipper error: {e}")
+                time.sleep(1.0)
+
+    def _ship_once(self):
+        if self.overflow:
+            overflow = []
+            while self.overflow:
+                overflow.append(self.overflow.popleft())
+            self._spool(overflow)
+        batch = self._next_batch()
+        if batch:
+            if not self.backend_up or not self._send_with_retry(batch):
+                self._spool(batch)
+        if self._has_spool() and time.time() >= self.next_replay:
+            self._replay_spool()
+
+    def _next_batch(self):
+        """Collect up to batch_size events, waiting at most batch_interval after the first"""
+        try:
+            batch = [self.queue.get(timeout=1.0)]
+        except queue.Empty:
+            return []
+        deadline = time.time() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send_with_retry(self, batch):
+        delay = 0.5
+        for attempt in range(self.retries):
+            if self._send(batch):
+                self._mark_up()
+                return True
+            if attempt < self.retries - 1:
+                time.sleep(delay)
+                delay *= 2
+        self._mark_down()
+        return False
+
+    def _send(self, batch):
+        """Post a batch, returns False if it has to be sent again.
+
+        With the single-post fallback, events are taken off the front of
+        batch as the backend accepts them, so after a failure the retry or
+        the spool only gets the events it has not seen.
+        """
+        start = time.time()
+        delivered = []
+        done = True
+        if self.bulk_supported:
+            status = self._post('/api/log/batch', {'events': batch})
+            if status == 404:
+                # Older backend without the bulk endpoint
+                print("Backend has no /api/log/batch, falling back to single posts")
+                self.bulk_supported = False
+            elif not self._handled(status, len(batch)):
+                return False
+            elif status == 200:
+                delivered = list(batch)
+        if not self.bulk_supported:
+            while batch:
+                status = self._post('/api/log', batch[0])
+                if not self._handled(status, 1):
+                    break
+                event_data = batch.pop(0)
+                if status == 200:
+                    delivered.append(event_data)
+            done = not batch
+
+        if delivered:
+            self.last_send_ms = (time.time() - start) * 1000
+            self.total_send_ms += self.last_send_ms
+            self.last_batch_size = len(delivered)
+            self.batches_sent += 1
+            self.events_sent += len(delivered)
+            if self.trace:
+                # Queueing and sending, from the moment the event was created
+                end = time.time()
+                for event_data in delivered:
+                    if 'frame_id' in event_data:
+                        self.trace(event_data['frame_id'], 'ship', event_data['timestamp'], end,
+                                   event_data.get('camera_id'))
+            print(f"Sent {len(delivered)} event(s) to backend")
+        return done
+
+    def _post(self, path, payload):
+        """POST to the backend, returns the status code or None when it could not be reached"""
+        try:
+            return self.session.post(f'{self.base_url}{path}', json=payload, timeout=self.timeout).status_code
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to send events to backend: {e}")
+            self.send_failures += 1
+            return None
+
+    def _handled(self, status, count):
+        """True when the backend is done with these events (accepted or rejected for good)"""
+        if status is None:
+            return False
+        if 400 <= status < 500:
+            # The backend will never accept these, retrying would only block the queue
+            print(f"Backend rejected {count} event(s) with status {status}")
+            self.events_rejected += count
+            return True
+        if status != 200:
+            print(f"Backend responded with status {status}")
+            self.send_failures += 1
+            return False
+        return True
+
+    def _mark_up(self):
+        self.backend_up = True
+        self.backoff = 0.0
+        self.next_replay = 0.0
+
+    def _mark_down(self):
+        # Back off exponentially before the next replay attempt
+        self.backend_up = False
+        self.backoff = min(max(self.backoff * 2, 1.0), self.max_backoff)
+        self.next_replay = time.time() + self.backoff
+
+    def _spool(self, events, count=True):
+        """Append events to the local spool file (one JSON object per line)"""
+        with self.spool_lock:
+            try:
+                with open(self.spool_path, 'a+') as f:
+                    if f.tell() and not _ends_with_newline(self.spool_path):
+                        f.write('\n')  # a torn last line must not swallow the next event
+                    for event_data in events:
+                        f.write(json.dumps(event_data) + '\n')
+            except OSError as e:
+                print(f"Could not spool {len(events)} event(s), they are lost: {e}")
+                self.events_lost += len(events)
+                return
+            if count:
+                self.events_spooled += len(events)
+
+    def _has_spool(self):
+        return os.path.exists(self.spool_path) and os.path.getsize(self.spool_path) > 0
+
+    def _recover_replay_file(self):
+        """Put back events from a replay interrupted by a restart"""
+        replay_path = self.spool_path + '.replay'
+        if os.path.exists(replay_path):
+            events = self._read_spool(replay_path)
+            if events:
+                self._spool(events, count=False)
+            os.remove(replay_path)
+
+    def _read_spool(self, path):
+        """Events of a spool file, lines that do not parse (torn by a crash) go to <spool>.bad"""
+        events, bad = [], []
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    bad.append(line if line.endswith('\n') else line + '\n')
+        if bad:
+            print(f"Skipped {len(bad)} unreadable spool line(s), kept in {self.spool_path}.bad")
+            self.spool_corrupt += len(bad)
+            try:
+                with open(self.spool_path + '.bad', 'a') as f:
+                    f.writelines(bad)
+            except OSError as e:
+                print(f"Could not keep the unreadable spool lines: {e}")
+        return events
+
+    def _replay_spool(self):
+        """Send spooled events in batches, whatever cannot be sent goes back to the spool"""
+        replay_path = self.spool_path + '.replay'
+        with self.spool_lock:
+            os.replace(self.spool_path, replay_path)
+        events = self._read_spool(replay_path)
+
+        remaining = []
+        for i in range(0, len(events), self.batch_size):
+            batch = events[i:i + self.batch_size]
+            if not self._send(batch):
+                # batch now holds only what the backend did not get
+                self._mark_down()
+                remaining = batch + events[i + self.batch_size:]
+                break
+        else:
+            self._mark_up()
+
+        if remaining:
+            self._spool(remaining, count=False)
+        os.remove(replay_path)
+        sent = len(events) - len(remaining)
+        if sent:
+            print(f"Replayed {sent} spooled event(s)")
+
+    def stats(self):
+        """Counters for the status endpoint"""
+        return {
+            'queue_depth': self.queue.qsize(),
+            'backend_up': self.backend_up,
+            'events_sent': self.events_sent,
+            'events_spooled': self.events_spooled,
+            'events_rejected': self.events_rejected,
+            'events_lost': self.events_lost,
+            'spool_corrupt': self.spool_corrupt,
+            'spool_pending': self._has_spool(),
+            'batches_sent': self.batches_sent,
+            'send_failures': self.send_failures,
+            'last_batch_size': self.last_batch_size,
+            'last_send_ms': round(self.last_send_ms, 1),
+            'avg_send_ms': round(self.total_send_ms / self.batches_sent, 1) if self.batches_sent else 0.0,
+        }
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
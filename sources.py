@@ -0,0 +1,335 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from buffers import unwrap
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+JPEG_SOI = b'\xff\xd8'
+
+
+class CompressedFrame:
+    """A JPEG frame exactly as the camera delivered it.
+
+    Pixels are only decoded when something asks for them (inference, a
+    resized stream profile), and each decode flavour happens once per frame
+    however many consumers ask.
+    """
+
+    def __init__(self, data):
+        self.data = data  # JPEG bytes
+        self._decoded = {}
+        self._lock = threading.Lock()
+
+    def decode(self, flags=cv2.IMREAD_COLOR):
+        """Decoded image, e.g. flags=cv2.IMREAD_REDUCED_GRAYSCALE_4 for a cheap small gray copy"""
+        with self._lock:
+            image = self._decoded.get(flags)
+            if image is None:
+                image = cv2.imdecode(np.frombuffer(self.data, dtype=np.uint8), flags)
+                self._decoded[flags] = image
+            return image
+
+
+def as_image(frame):
+    """BGR pixels for a frame, decoding it first if it is a CompressedFrame"""
+    if isinstance(frame, CompressedFrame):
+        return frame.decode()
+    return unwrap(frame)
+
+
+class PassthroughCapture:
+    """USB capture that returns the camera's MJPEG buffers as CompressedFrames, without decoding"""
+
+    def __init__(self, cap):
+        self.cap = cap
+
+    def read(self, image=None):
+        # image (a buffer to decode into) is ignored, the JPEG bytes are copied out anyway
+        ok, buf = self.cap.read()
+        if not ok or buf is None:
+            return False, None
+        return True, CompressedFrame(buf.tobytes())
+
+    def release(self):
+        self.cap.release()
+
+
+def open_usb(index, width, height, fps, passthrough=False):
+    cap = cv2.VideoCapture(index, cv2.CAP_V4L2)
+    if not cap.isOpened():
+        return None
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    if passthrough:
+        # Hand out the raw MJPEG buffers instead of decoding them to BGR
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    ok, frame = cap.read()
+    if not ok:
+        cap.release()
+        return None
+    if passthrough:
+        if frame is not None and frame.tobytes()[:2] == JPEG_SOI:
+            return PassthroughCapture(cap)
+        print("Camera does not deliver MJPEG buffers, passthrough disabled")
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+    return cap
+
+
+def capture_time(cap):
+    """Wall-clock time the driver captured the frame last read from cap, None if it does not say
+
+    V4L2 stamps its buffers with CLOCK_MONOTONIC, which OpenCV reports as
+    CAP_PROP_POS_MSEC; other backends and files report a media position
+    there instead, so anything that is not a plausible recent monotonic
+    time is ignored.
+    """
+    raw = cap.cap if isinstance(cap, PassthroughCapture) else cap
+    if not isinstance(raw, cv2.VideoCapture):
+        return None
+    msec = raw.get(cv2.CAP_PROP_POS_MSEC)
+    if not msec or msec <= 0:
+        return None
+    age = time.monotonic() - msec / 1000.0
+    if not 0 <= age < 1.0:
+        return None
+    return time.time() - age
+
+
+def load_camera_cache(path):
+    """Last camera that opened successfully, or None"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_camera_cache(path, index, cap, width, height, fps, passthrough):
+    """Remember the device and the format it negotiated, so the next start tries it first"""
+    if not path:
+        return
+    raw = cap.cap if isinstance(cap, PassthroughCapture) else cap
+    fourcc = int(raw.get(cv2.CAP_PROP_FOURCC))
+    entry = {
+        'index': index,
+        'requested': [width, height, fps, passthrough],
+        'width': int(raw.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(raw.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'fps': raw.get(cv2.CAP_PROP_FPS),
+        'fourcc': ''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)),
+        'saved_at': time.time()
+    }
+    try:
+        with open(path, 'w') as f:
+            json.dump(entry, f)
+    except OSError as e:
+        print(f"Could not write camera cache: {e}")
+
+
+def probe_usb(index, width, height, fps, passthrough=False, cache_path=None, claimed=None, owner=None):
+    """Open the given camera index, or find a working one of 0-3 when index < 0
+
+    The cached last good device is tried first; otherwise all indices are
+    probed in parallel and the lowest one that works wins; the others are
+    closed again before returning, so the caller's next probe finds them
+    free. claimed maps index -> owner for the devices other cameras use,
+    those are skipped and the index that opens is claimed for owner.
+    """
+    claimed = claimed if claimed is not None else {}
+    if index >= 0:
+        cap = open_usb(index, width, height, fps, passthrough)
+        if cap is None:
+            print(f"Error: Failed to open camera {index}")
+        else:
+            claimed[index] = owner
+        return cap
+
+    def free(i):
+        return claimed.get(i, owner) == owner
+
+    cached = load_camera_cache(cache_path)
+    if cached and cached.get('requested') == [width, height, fps, passthrough] and free(cached['index']):
+        print(f"Trying cached camera index {cached['index']}...")
+        cap = open_usb(cached['index'], width, height, fps, passthrough)
+        if cap:
+            print(f"Opened camera {cached['index']} "
+                  f"({cached['width']}x{cached['height']} {cached['fourcc']})")
+            claimed[cached['index']] = owner
+            return cap
+
+    indices = [i for i in (0, 1, 2, 3) if free(i)]
+    if not indices:
+        print("Error: Camera indices 0-3 are all in use.")
+        return None
+    print(f"Probing camera indices {', '.join(map(str, indices))}...")
+    with ThreadPoolExecutor(max_workers=len(indices)) as pool:
+        futures = [pool.submit(open_usb, i, width, height, fps, passthrough) for i in indices]
+    # Every probe has finished here: keep the lowest index that opened, close the rest
+    caps = [future.result() for future in futures]
+    found = next((pos for pos, cap in enumerate(caps) if cap), None)
+    for pos, cap in enumerate(caps):
+        if cap and pos != found:
+            cap.release()
+    if found is None:
+        print("Error: Could not open any USB camera.")
+        return None
+    i, cap = indices[found], caps[found]
+    print(f"Opened camera {i}")
+    save_camera_cache(cache_path, i, cap, width, height, fps, passthrough)
+    claimed[i] = owner
+    return cap
+
+
+class FrameSource:
+    """Base class for offline frame sources, read() -> (ok, frame) like cv2.VideoCapture.
+
+    With pace='realtime' frames are delivered at the source's frame rate,
+    with pace='fast' as fast as they can be produced (for throughput runs).
+    """
+
+    def __init__(self, fps, pace='realtime', max_frames=0):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.pace = pace
+        self.max_frames = max_frames
+        self.frames_read = 0
+        self._start = None
+
+    def read(self, image=None):
+        """Next frame, written into image when the source can (like cv2.VideoCapture.read)"""
+        if self.max_frames and self.frames_read >= self.max_frames:
+            return False, None
+        ok, frame = self._read(image)
+        if not ok:
+            return False, None
+
+        if self._start is None:
+            self._start = time.time()
+        elif self.pace == 'realtime':
+            # Pace against the start time so sleep jitter does not accumulate
+            wait = self._start + self.frames_read / self.fps - time.time()
+            if wait > 0:
+                time.sleep(wait)
+        self.frames_read += 1
+        return True, frame
+
+    def _read(self, image):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class VideoFileSource(FrameSource):
+    """Replay a recorded video file"""
+
+    def __init__(self, path, pace='realtime', loop=False, max_frames=0):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open video file {path}")
+        super().__init__(self.cap.get(cv2.CAP_PROP_FPS), pace, max_frames)
+        self.loop = loop
+
+    def _read(self, image):
+        ok, frame = self.cap.read(image)
+        if not ok and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read(image)
+        return ok, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirSource(FrameSource):
+    """Replay a directory of still images in file name order
+
+    With passthrough, JPEG files are handed out undecoded as CompressedFrames.
+    """
+
+    def __init__(self, path, fps, pace='realtime', loop=False, max_frames=0, passthrough=False):
+        super().__init__(fps, pace, max_frames)
+        self.passthrough = passthrough
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.files:
+            raise IOError(f"No images found in {path}")
+        self.loop = loop
+        self.pos = 0
+
+    def _read(self, image):
+        if self.pos >= len(self.files):
+            if not self.loop:
+                return False, None
+            self.pos = 0
+        path = self.files[self.pos]
+        self.pos += 1
+        if self.passthrough and path.lower().endswith(('.jpg', '.jpeg')):
+            with open(path, 'rb') as f:
+                return True, CompressedFrame(f.read())
+        frame = cv2.imread(path)
+        return frame is not None, frame
+
+
+class SyntheticSource(FrameSource):
+    """Generated test pattern with a moving block, no camera or files needed"""
+
+    def __init__(self, width, height, fps, pace='realtime', max_frames=0):
+        super().__init__(fps, pace, max_frames)
+        self.width = width
+        self.height = height
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        self.background = np.repeat(np.tile(gradient, (height, 1))[:, :, None], 3, axis=2)
+        self.count = 0
+
+    def _read(self, image):
+        if image is not None and image.shape == self.background.shape:
+            frame = image
+            np.copyto(frame, self.background)
+        else:
+            frame = self.background.copy()
+        size = max(self.height // 4, 1)
+        x = (self.count * 8) % max(self.width - size, 1)
+        y = (self.height - size) // 2
+        frame[y:y + size, x:x + size] = (0, 128, 255)
+        self.count += 1
+        return True, frame
+
+
+def open_source(spec, index, width, height, fps, pace='realtime', loop=False, max_frames=0,
+                passthrough=False, cache_path=None, claimed=None, owner=None):
+    """Open a frame source from a --source spec, returns None if it cannot be opened
+
+    usb              USB camera at --index (probes 0-3 when --index < 0)
+    usb:N            USB camera N
+    video:PATH       recorded video file
+    images:DIR       directory of images
+    synthetic        generated test pattern
+
+    passthrough applies to USB cameras and JPEG image directories: read() then
+    returns CompressedFrames. cache_path remembers the last good USB camera,
+    claimed / owner keep several cameras from probing the same device.
+    """
+    kind, _, target = spec.partition(':')
+    try:
+        if kind == 'usb':
+            return probe_usb(int(target) if target else index, width, height, fps, passthrough, cache_path,
+                             claimed, owner)
+        if kind == 'video':
+            return VideoFileSource(target, pace, loop, max_frames)
+        if kind == 'images':
+            return ImageDirSource(target, fps, pace, loop, max_frames, passthrough)
+        if kind == 'synthetic':
+            return SyntheticSource(width, height, fps, pace, max_frames)
+    except (IOError, OSError) as e:
+        print(f"Error: {e}")
+        return None
+    print(f"Error: Unknown frame source '{spec}'")
+    return None
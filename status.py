@@ -0,0 +1,56 @@
+import hashlib
+import json
+import threading
+import time
+from types import MappingProxyType
+from metrics import metrics
+
+
+class StatusSnapshot:
+    """Immutable status at one point in time.
+
+    Rendered JSON bodies and their ETags are cached on the snapshot, so
+    every reader of the same snapshot shares one serialization.
+    """
+
+    __slots__ = ('data', 'version', '_rendered')
+
+    def __init__(self, data, version):
+        self.data = MappingProxyType(data)
+        self.version = version
+        self._rendered = {}
+
+    def render(self, view, build):
+        """JSON body and ETag for a view of this snapshot, build(data) -> dict"""
+        rendered = self._rendered.get(view)
+        if rendered is None:
+            body = json.dumps(build(self.data)).encode()
+            rendered = (body, hashlib.sha1(body).hexdigest()[:16])
+            self._rendered[view] = rendered
+        return rendered
+
+
+class StatusBoard:
+    """Publishes a new StatusSnapshot only when a field actually changes.
+
+    Writers go through update(); readers just take `board.current`, a
+    plain attribute read that needs no lock and always sees a complete
+    snapshot.
+    """
+
+    def __init__(self, initial):
+        self._lock = threading.Lock()
+        self.current = StatusSnapshot(dict(initial), 0)
+
+    def update(self, **changes):
+        """Apply changes, returns True if a new snapshot was published"""
+        with metrics.timed_lock(self._lock, 'status_lock_wait'):
+            old = self.current
+            if all(k in old.data and old.data[k] == v for k, v in changes.items()):
+                return False
+            data = dict(old.data)
+            data.update(changes)
+            if 'timestamp' not in changes:
+                data['timestamp'] = time.time()
+            self.current = StatusSnapshot(data, old.version + 1)
+            return True
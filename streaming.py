@@ -0,0 +1,262 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from metrics import metrics
+from sources import CompressedFrame
+from buffers import retain, release, unwrap
+
+
+class StreamProfile:
+    """One encoded variant of the stream: output width, JPEG quality and frame rate cap.
+
+    Every client asking for the same profile shares its encoded frames. A
+    profile is only encoded while it has subscribers.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.width, self.quality, self.max_fps = key
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, self.quality] if self.quality else []
+        self.cond = threading.Condition()
+        self.jpeg = None
+        self.frame_id = None  # pipeline frame the current jpeg was made from
+        self.version = 0
+        self.clients = 0
+        self.busy = False  # an encode for this profile is in flight
+        self.next_due = 0.0
+        self.last_used = time.time()
+        self.frames_encoded = 0
+
+    def due(self, now):
+        """Rate limit: True if this profile should encode a frame now"""
+        if not self.max_fps:
+            return True
+        interval = 1.0 / self.max_fps
+        # A quarter frame of slack so camera jitter does not halve the rate
+        if now < self.next_due - interval * 0.25:
+            return False
+        self.next_due = max(self.next_due, now - interval) + interval
+        return True
+
+
+class FrameHub:
+    """Encode-once MJPEG broadcaster shared by every /video_feed client.
+
+    The capture loop hands frames over with publish(), which never blocks on
+    encoding. For every profile with subscribers, a shared encoder pool
+    resizes and encodes each new frame once into a versioned JPEG buffer,
+    and each client waits for a version newer than the last one it sent. A
+    slow client therefore skips straight to the newest frame instead of
+    queueing old ones or slowing the other viewers down. Profiles without
+    clients for idle_timeout seconds are evicted.
+    """
+
+    def __init__(self, quality=None, max_fps=None, workers=2, max_profiles=8, idle_timeout=10.0):
+        self.default_key = (None, quality, max_fps)
+        self.max_profiles = max_profiles
+        self.idle_timeout = idle_timeout
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='encoder')
+        self.profiles = {self.default_key: StreamProfile(self.default_key)}
+        self.profiles_lock = threading.Lock()
+        self._raw = None
+        self._raw_id = None
+        self._raw_cond = threading.Condition()
+        self.trace = None  # trace(frame_id, stage, start, end) for the encode stage
+        self._thread = None
+        self.frames_published = 0
+        self.frames_skipped = 0  # replaced before the dispatcher got to them
+        self.listeners = []  # callables run with the profile after each new frame, e.g. to wake asyncio clients
+
+    def start(self):
+        """Start the dispatcher thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def publish(self, frame, frame_id=None):
+        """Hand the newest frame to the encoders (the frame must not be modified afterwards)
+
+        frame is a BGR image, a PooledFrame or a CompressedFrame; the latter
+        is streamed without re-encoding wherever the profile allows it. The
+        hub takes its own reference on pooled frames until they are encoded.
+        frame_id goes out with the encoded frame as its X-Frame-Id header.
+        """
+        retain(frame)
+        with metrics.timed_lock(self._raw_cond, 'frame_lock_wait'):
+            if self._raw is not None:
+                self.frames_skipped += 1
+                release(self._raw)
+            self._raw = frame
+            self._raw_id = frame_id
+            self.frames_published += 1
+            self._raw_cond.notify()
+
+    def set_quality(self, quality):
+        """Change the JPEG quality of the default profile at runtime (its key stays the same)"""
+        with self.profiles_lock:
+            prof = self.profiles[self.default_key]
+            prof.quality = quality
+            prof.params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality else []
+
+    def profile(self, width=None, quality=None, max_fps=None):
+        """Get or create the profile for these parameters (None = hub default)"""
+        key = (width,
+               quality if quality is not None else self.default_key[1],
+               max_fps if max_fps is not None else self.default_key[2])
+        with self.profiles_lock:
+            prof = self.profiles.get(key)
+            if prof is None:
+                if len(self.profiles) >= self.max_profiles:
+                    return self.profiles[self.default_key]
+                prof = self.profiles[key] = StreamProfile(key)
+            prof.last_used = time.time()
+            return prof
+
+    def _dispatch_loop(self):
+        last_evict = time.time()
+        while True:
+            with self._raw_cond:
+                while self._raw is None:
+                    self._raw_cond.wait()
+                frame, frame_id = self._raw, self._raw_id
+                self._raw = None
+
+            now = time.time()
+            with self.profiles_lock:
+                profiles = list(self.profiles.values())
+            for prof in profiles:
+                # Skip profiles nobody watches and ones still encoding the previous frame
+                if prof.clients == 0 or prof.busy or not prof.due(now):
+                    continue
+                prof.busy = True
+                self.pool.submit(self._encode, prof, retain(frame), frame_id)
+            release(frame)
+
+            if now - last_evict >= 1.0:
+                last_evict = now
+                self._evict_idle(now)
+
+    def _encode(self, prof, pooled, frame_id=None):
+        frame = unwrap(pooled)
+        start = time.time()
+        try:
+            if isinstance(frame, CompressedFrame):
+                if self._passthrough(prof):
+                    # Camera JPEG goes out as-is, no decode / re-encode
+                    self._store(prof, frame.data, frame_id)
+                    metrics.inc('frames_passthrough_total')
+                    return
+                with metrics.timer('imdecode'):
+                    frame = frame.decode()
+            if prof.width and frame.shape[1] > prof.width:
+                h, w = frame.shape[:2]
+                with metrics.timer('resize'):
+                    frame = cv2.resize(frame, (prof.width, max(h * prof.width // w, 1)),
+                                       interpolation=cv2.INTER_AREA)
+            with metrics.timer('imencode'):
+                ret, buffer = cv2.imencode('.jpg', frame, prof.params)
+            if not ret:
+                return
+            self._store(prof, buffer.tobytes(), frame_id)
+            if self.trace and frame_id is not None:
+                self.trace(frame_id, 'encode', start, time.time())
+        finally:
+            prof.busy = False
+            release(pooled)
+
+    def _passthrough(self, prof):
+        """Profiles that can use the camera's own JPEG: the default one, or full size at native quality"""
+        return prof.key == self.default_key or (prof.width is None and prof.quality is None)
+
+    def _store(self, prof, jpeg, frame_id=None):
+        with prof.cond:
+            prof.jpeg = jpeg
+            prof.frame_id = frame_id
+            prof.version += 1
+            prof.frames_encoded += 1
+            prof.cond.notify_all()
+        for listener in self.listeners:
+            listener(prof)
+
+    def _evict_idle(self, now):
+        with self.profiles_lock:
+            for key, prof in list(self.profiles.items()):
+                if key != self.default_key and prof.clients == 0 and now - prof.last_used > self.idle_timeout:
+                    del self.profiles[key]
+
+    def latest(self, prof):
+        """Newest (version, jpeg_bytes, frame_id) of prof without waiting"""
+        with prof.cond:
+            return prof.version, prof.jpeg, prof.frame_id
+
+    def wait_for_frame(self, prof, last_version, timeout=1.0):
+        """Wait for a frame of prof newer than last_version, returns (version, jpeg_bytes, frame_id)"""
+        with prof.cond:
+            prof.cond.wait_for(lambda: prof.version > last_version, timeout)
+            return prof.version, prof.jpeg, prof.frame_id
+
+    def subscribe(self, prof):
+        with prof.cond:
+            prof.clients += 1
+
+    def unsubscribe(self, prof):
+        with prof.cond:
+            prof.clients -= 1
+            prof.last_used = time.time()
+
+    def stream(self, width=None, quality=None, max_fps=None):
+        """Generator yielding multipart MJPEG parts for one client"""
+        prof = self.profile(width, quality, max_fps)
+        self.subscribe(prof)
+        try:
+            version = 0
+            while True:
+                new_version, jpeg, frame_id = self.wait_for_frame(prof, version)
+                if new_version == version:
+                    continue  # Timed out, no new frame yet
+                version = new_version
+                metrics.inc('frames_streamed_total')
+                yield mjpeg_part(jpeg, frame_id)
+        finally:
+            self.unsubscribe(prof)
+
+    def stats(self):
+        """Counters for the status endpoint"""
+        with self.profiles_lock:
+            profiles = list(self.profiles.values())
+        return {
+            'clients': sum(p.clients for p in profiles),
+            'frames_published': self.frames_published,
+            'frames_encoded': sum(p.frames_encoded for p in profiles),
+            'frames_skipped': self.frames_skipped,
+            'profiles': [{'width': p.width, 'quality': p.quality, 'max_fps': p.max_fps,
+                          'clients': p.clients, 'frames_encoded': p.frames_encoded} for p in profiles],
+        }
+
+
+def mjpeg_part(jpeg, frame_id=None):
+    """One part of the multipart/x-mixed-replace MJPEG stream, with an X-Frame-Id header when known"""
+    frame_header = f'X-Frame-Id: {frame_id}\r\n'.encode() if frame_id is not None else b''
+    return b'--frame\r\nContent-Type: image/jpeg\r\n' + frame_header + b'\r\n' + jpeg + b'\r\n'
+
+
+def profile_args(args):
+    """Read width / quality / fps stream profile parameters from request args
+
+    Values are clamped and rounded so clients asking for nearly the same
+    thing end up sharing one profile.
+    """
+    def number(name, low, high, step):
+        try:
+            value = int(args.get(name))
+        except (TypeError, ValueError):
+            return None
+        return min(max(value // step * step, low), high)
+
+    return {
+        'width': number('width', 160, 3840, 32),
+        'quality': number('quality', 10, 95, 5),
+        'max_fps': number('fps', 1, 60, 1),
+    }
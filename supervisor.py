@@ -0,0 +1,124 @@
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from metrics import metrics
+
+
+class InferenceGate:
+    """Shares the inference CPU between cameras.
+
+    At most `slots` cameras run inference at the same time. When cameras
+    are waiting, the one that has used the least inference time goes next,
+    so a camera with bigger frames or more motion cannot crowd the others
+    out. A camera that was idle for a while catches up to the others
+    instead of getting a long run of turns to make up for it.
+    """
+
+    def __init__(self, slots=1):
+        self.slots = slots
+        self.busy = 0
+        self.waiting = set()  # each camera has one inference stage, so one entry per camera
+        self.used = {}  # camera -> inference seconds
+        self.waited = {}  # camera -> seconds spent waiting for a turn
+        self.turns = {}
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def turn(self, name):
+        """Block until this camera may run inference, for the duration of the with block"""
+        start = time.perf_counter()
+        with self._cond:
+            floor = min((self.used[other] for other in self.waiting), default=0.0)
+            self.used[name] = max(self.used.get(name, 0.0), floor)
+            self.waiting.add(name)
+            self._cond.wait_for(lambda: self.busy < self.slots and self._next() == name)
+            self.waiting.discard(name)
+            self.busy += 1
+        granted = time.perf_counter()
+        metrics.observe('inference_gate_wait', granted - start)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.busy -= 1
+                self.used[name] += time.perf_counter() - granted
+                self.waited[name] = self.waited.get(name, 0.0) + granted - start
+                self.turns[name] = self.turns.get(name, 0) + 1
+                self._cond.notify_all()
+
+    def _next(self):
+        return min(self.waiting, key=lambda name: self.used[name])
+
+    def stats(self, name):
+        """Turns and average wait of one camera"""
+        turns = self.turns.get(name, 0)
+        return {
+            'slots': self.slots,
+            'turns': turns,
+            'avg_wait_ms': round(self.waited.get(name, 0.0) / turns * 1000, 2) if turns else 0.0,
+        }
+
+
+class Supervisor:
+    """Runs every camera in its own thread and restarts the ones that stop.
+
+    run(unit) opens the camera and runs its pipeline until the source
+    fails; it returns True when the camera is done for good (an offline
+    source reached its end) and must not be restarted. A camera that stops
+    or raises is started again after restart_delay, doubling up to
+    max_delay while it keeps failing quickly. Other cameras are not
+    affected. on_change(unit, state) is called on every state change.
+    """
+
+    def __init__(self, run, restart_delay=1.0, max_delay=30.0, stable_after=60.0, on_change=None):
+        self.run = run
+        self.restart_delay = restart_delay
+        self.max_delay = max_delay
+        self.stable_after = stable_after  # a run this long resets the backoff
+        self.on_change = on_change
+        self.units = {}  # name -> {'unit', 'state', 'restarts', 'last_error', 'thread'}
+
+    def add(self, name, unit):
+        self.units[name] = {'unit': unit, 'state': 'stopped', 'restarts': 0, 'last_error': None,
+                            'thread': None}
+        return self
+
+    def start(self):
+        for name, entry in self.units.items():
+            entry['thread'] = threading.Thread(target=self._supervise, args=(name,), daemon=True)
+            entry['thread'].start()
+        return self
+
+    def _set_state(self, entry, state):
+        entry['state'] = state
+        if self.on_change:
+            self.on_change(entry['unit'], state)
+
+    def _supervise(self, name):
+        entry = self.units[name]
+        delay = self.restart_delay
+        while True:
+            self._set_state(entry, 'running')
+            started = time.time()
+            try:
+                if self.run(entry['unit']):
+                    self._set_state(entry, 'finished')
+                    return
+                entry['last_error'] = 'camera could not be opened or stopped delivering frames'
+            except Exception as e:
+                traceback.print_exc()
+                entry['last_error'] = f"{type(e).__name__}: {e}"
+
+            if time.time() - started >= self.stable_after:
+                delay = self.restart_delay
+            entry['restarts'] += 1
+            metrics.inc('camera_restarts_total')
+            print(f"Camera {name}: {entry['last_error']}, restarting in {delay:.0f}s")
+            self._set_state(entry, 'restarting')
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_delay)
+
+    def stats(self, name):
+        entry = self.units[name]
+        return {'state': entry['state'], 'restarts': entry['restarts'], 'last_error': entry['last_error']}
@@ -0,0 +1,123 @@
+"""classify_batch must give the same answers as the original per-landmark rules.
+
+Run with: python -m pytest -q test_gestures.py
+"""
+from types import SimpleNamespace
+import numpy as np
+from gestures import GESTURES, LABELS, classify_batch, classify_points, detect_gesture
+
+
+# The rules as they were before vectorization, kept verbatim as the reference
+def get_finger_curl(landmarks, tip_idx, pip_idx, mcp_idx, h):
+    tip_y = landmarks[tip_idx].y * h
+    pip_y = landmarks[pip_idx].y * h
+    mcp_y = landmarks[mcp_idx].y * h
+    return (tip_y - pip_y) / max(abs(mcp_y - pip_y), 1)
+
+
+def is_fist(landmarks, h, w):
+    folded = 0
+    for t, p in zip([8, 12, 16, 20], [6, 10, 14, 18]):
+        tip_y = landmarks[t].y * h
+        pip_y = landmarks[p].y * h
+        if tip_y > pip_y - (h * 0.02):
+            folded += 1
+    return folded == 4
+
+
+def is_scissors(landmarks, h, w):
+    index_curl = get_finger_curl(landmarks, 8, 6, 5, h)
+    middle_curl = get_finger_curl(landmarks, 12, 10, 9, h)
+    ring_curl = get_finger_curl(landmarks, 16, 14, 13, h)
+    pinky_curl = get_finger_curl(landmarks, 20, 18, 17, h)
+    return index_curl < 0.3 and middle_curl < 0.3 and ring_curl > 0.5 and pinky_curl > 0.4
+
+
+def is_middle_finger(landmarks, h, w):
+    index_curl = get_finger_curl(landmarks, 8, 6, 5, h)
+    middle_curl = get_finger_curl(landmarks, 12, 10, 9, h)
+    ring_curl = get_finger_curl(landmarks, 16, 14, 13, h)
+    pinky_curl = get_finger_curl(landmarks, 20, 18, 17, h)
+    fingers_more_folded = 0
+    if index_curl > middle_curl + 0.1:
+        fingers_more_folded += 1
+    if ring_curl > middle_curl + 0.1:
+        fingers_more_folded += 1
+    if pinky_curl > middle_curl + 0.1:
+        fingers_more_folded += 1
+    return middle_curl < 0.6 and fingers_more_folded >= 2
+
+
+def is_paper(landmarks, h, w):
+    extended = 0
+    for t, p, m in zip([8, 12, 16, 20], [6, 10, 14, 18], [5, 9, 13, 17]):
+        if get_finger_curl(landmarks, t, p, m, h) < 0.3:
+            extended += 1
+    return extended == 4
+
+
+def old_detect_gesture(landmarks, h, w):
+    if is_middle_finger(landmarks, h, w):
+        return 'middle_finger', 'MIDDLE FINGER'
+    elif is_fist(landmarks, h, w):
+        return 'rock', 'ROCK (FIST)'
+    elif is_scissors(landmarks, h, w):
+        return 'scissors', 'SCISSORS (PEACE)'
+    elif is_paper(landmarks, h, w):
+        return 'paper', 'PAPER (OPEN HAND)'
+    return None, ''
+
+
+def as_landmarks(points):
+    # MediaPipe hands out float32 coordinates as Python floats
+    return [SimpleNamespace(x=float(x), y=float(y), z=float(z)) for x, y, z in points]
+
+
+def assert_same(points, h):
+    codes = classify_batch(points, h)
+    for hand, code in zip(points, codes):
+        expected = old_detect_gesture(as_landmarks(hand), h, 640)
+        assert (GESTURES[int(code)], LABELS[GESTURES[int(code)]]) == expected
+
+
+def test_random_hands():
+    rng = np.random.default_rng(0)
+    points = rng.random((5000, 21, 3), dtype=np.float32)
+    for h in (480, 720, 1080):
+        assert_same(points, h)
+
+
+def test_near_threshold_hands():
+    # y values on a coarse grid put tips, pips and mcps exactly on the rule boundaries
+    rng = np.random.default_rng(1)
+    grid = rng.integers(0, 50, size=(5000, 21, 3)) / 50
+    assert_same(grid.astype(np.float32), 500)
+    # Tips a hair above / below the fist margin
+    points = rng.random((2000, 21, 3), dtype=np.float32)
+    pips = points[:, [6, 10, 14, 18], 1]
+    offsets = rng.choice([-0.02, -0.0201, -0.0199, 0.0], size=pips.shape).astype(np.float32)
+    points[:, [8, 12, 16, 20], 1] = pips + offsets
+    assert_same(points, 720)
+
+
+def test_per_hand_calls_match_batch():
+    rng = np.random.default_rng(2)
+    points = rng.random((200, 21, 3), dtype=np.float32)
+    batched = classify_points(points, 720)
+    assert batched == [detect_gesture(hand, 720, 1280) for hand in points]
+    assert batched == [old_detect_gesture(as_landmarks(hand), 720, 1280) for hand in points]
+    assert classify_points(np.empty((0, 21, 3), dtype=np.float32), 720) == []
+
+
+def test_curls_around_thresholds():
+    # Every finger curl combination from values on and around the rule thresholds
+    curls = np.array([-0.5, 0.0, 0.29, 0.3, 0.31, 0.39, 0.4, 0.41, 0.5, 0.51, 0.6, 0.61, 0.7, 1.0])
+    combos = np.stack(np.meshgrid(curls, curls, curls, curls, indexing='ij'), -1).reshape(-1, 4)
+    points = np.full((len(combos), 21, 3), 0.5, dtype=np.float32)
+    points[:, [5, 9, 13, 17], 1] = 0.6  # mcps, 0.1 * h below the pips
+    points[:, [8, 12, 16, 20], 1] = 0.5 + combos * 0.1
+    assert_same(points, 500)
+    # Scissors never wins: ring and pinky folded past its thresholds are always
+    # 0.1 more curled than a middle finger under 0.3, so the middle finger rule
+    # (checked first) matches too. The old rules behave the same way.
+    assert set(classify_batch(points, 500)) == {0, 1, 2, 4}
@@ -0,0 +1,79 @@
+import json
+import threading
+from collections import deque
+
+
+class TraceRecorder:
+    """Per-frame stage timings in a bounded buffer, exported as Chrome trace-event JSON.
+
+    Every span is (frame_id, stage, start, end, camera) with wall-clock
+    times, so capture timestamps taken from the camera driver line up with
+    the later stages. Open the export in chrome://tracing or Perfetto:
+    each camera is a process, each stage a thread, and every span carries
+    its frame_id. Once maxlen spans are buffered the oldest ones fall off.
+    """
+
+    def __init__(self, maxlen=20000):
+        self.spans = deque(maxlen=maxlen)
+        self.spans_recorded = 0
+        self._lock = threading.Lock()
+
+    def span(self, frame_id, stage, start, end, camera=None):
+        """Record that frame_id spent start..end (time.time() seconds) in stage"""
+        with self._lock:
+            self.spans.append((frame_id, stage, start, end, camera))
+            self.spans_recorded += 1
+
+    def tracer(self, camera):
+        """span() bound to one camera, for the pipeline and the stream hub"""
+        return lambda frame_id, stage, start, end: self.span(frame_id, stage, start, end, camera)
+
+    def snapshot(self, frame_id=None):
+        with self._lock:
+            spans = list(self.spans)
+        if frame_id is not None:
+            spans = [s for s in spans if s[0] == frame_id]
+        return spans
+
+    def export(self, frame_id=None):
+        """Buffered spans (optionally of one frame) as a Chrome trace-event JSON object"""
+        events = []
+        pids, tids = {}, {}
+        for fid, stage, start, end, camera in self.snapshot(frame_id):
+            name = camera or 'shared'
+            if name not in pids:
+                pids[name] = len(pids) + 1
+                events.append({'name': 'process_name', 'ph': 'M', 'pid': pids[name], 'args': {'name': name}})
+            pid = pids[name]
+            if (pid, stage) not in tids:
+                tids[pid, stage] = len(tids) + 1
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tids[pid, stage],
+                               'args': {'name': stage}})
+            events.append({'name': stage, 'cat': 'frame', 'ph': 'X', 'pid': pid, 'tid': tids[pid, stage],
+                           'ts': round(start * 1e6), 'dur': max(round((end - start) * 1e6), 0),
+                           'args': {'frame_id': fid}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.export(), f)
+
+    def summary(self):
+        """Count, mean and p50 / p99 milliseconds per stage over the buffered spans"""
+        by_stage = {}
+        for _, stage, start, end, _ in self.snapshot():
+            by_stage.setdefault(stage, []).append((end - start) * 1000)
+        result = {}
+        for stage, values in by_stage.items():
+            values.sort()
+            result[stage] = {
+                'count': len(values),
+                'mean_ms': round(sum(values) / len(values), 2),
+                'p50_ms': round(values[len(values) // 2], 2),
+                'p99_ms': round(values[min(int(len(values) * 0.99), len(values) - 1)], 2),
+            }
+        return result
+
+    def stats(self):
+        return {'spans_buffered': len(self.spans), 'spans_recorded': self.spans_recorded,
+                'capacity': self.spans.maxlen}
@@ -0,0 +1,288 @@
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import cv2
+import numpy as np
+from metrics import metrics
+from gestures import hand_results
+from hands import StubHands
+
+
+def make_detector(options):
+    """Hand detector for a worker process: rgb -> ((N,21,3) float32 points, [handedness, ...])"""
+    if options.get('detector') == 'stub':
+        # No model, for benchmarking the plumbing around inference
+        hands = StubHands(options.get('stub_delay', 0.0))
+    else:
+        import mediapipe as mp
+        hands = mp.solutions.hands.Hands(model_complexity=options.get('model_complexity', 0),
+                                         max_num_hands=options.get('max_hands', 1),
+                                         min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+    def detect(rgb):
+        return hand_results(hands.process(rgb))
+    return detect
+
+
+def _worker_main(conn, options):
+    """Worker process: read frames from its shared memory slot, send back landmarks only"""
+    detect = make_detector(options)
+    conn.send(('ready', None))
+    attached = {}
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        seq, name, shape = task
+        shm = attached.get(name)
+        if shm is None:
+            # Spawned workers share the parent's resource tracker, the parent unlinks the segment
+            shm = attached[name] = shared_memory.SharedMemory(name=name)
+        start = time.perf_counter()
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        del frame  # no views may outlive the segment
+        try:
+            points, handedness = detect(rgb)
+        except Exception as e:
+            print(f"Inference worker error: {e}")
+            points, handedness = np.empty((0, 21, 3), dtype=np.float32), []
+        conn.send(('result', (seq, points, handedness, time.perf_counter() - start)))
+    for shm in attached.values():
+        shm.close()
+
+
+class InferencePool:
+    """Hand inference in worker processes, frames passed through shared memory.
+
+    Each worker is a separate (spawned) process with its own MediaPipe
+    instance, so inference is no longer limited to one core by the GIL.
+    Every worker has its own shared memory slot and pipe: a frame is copied
+    into the slot of an idle worker and only the slot name and sequence
+    number go through the pipe; workers send back just the landmarks.
+    Results are handed to on_result(seq, points, handedness, shape,
+    seconds) strictly in sequence order, however the workers finish, from a
+    collector thread.
+
+    A worker that dies (or takes longer than task_timeout seconds on a
+    frame and is killed) is started again, and the frame it had is skipped
+    so later results are not held back. A worker that keeps dying before it
+    is ready is not restarted more than max_restarts times in a row; once
+    none is left, submit() raises.
+    """
+
+    def __init__(self, workers, on_result, options=None, task_timeout=5.0, max_restarts=3):
+        self.workers = workers
+        self.on_result = on_result
+        self.options = dict(options or {})
+        self.task_timeout = task_timeout
+        self.max_restarts = max_restarts
+        self._ctx = multiprocessing.get_context('spawn')
+        self.procs = []  # per worker: {'proc', 'conn', 'ready', 'seq' in flight or None}
+        self.slots = []  # SharedMemory block per worker, created on the first frame
+        self.slot_size = 0
+        self.cond = threading.Condition()
+        self.pending = {}  # seq -> (frame shape, worker, submit time), submitted and not delivered yet
+        self.done = {}  # seq -> result that arrived ahead of an older frame
+        self.frames_submitted = 0
+        self.frames_completed = 0
+        self.frames_reordered = 0
+        self.frames_oversized = 0
+        self.frames_lost = 0  # worker died or was killed while on the frame
+        self.worker_restarts = 0
+        self.failed_restarts = 0  # restarts since a worker last came up
+        self.busy_time = 0.0
+        self.started_at = None
+        self.closed = False
+        self._collector = None
+
+    def start(self):
+        """Spawn the worker processes and the result collector"""
+        self.procs = [self._spawn() for _ in range(self.workers)]
+        self._collector = threading.Thread(target=self._collect_loop, daemon=True)
+        self._collector.start()
+        self.started_at = time.time()
+        return self
+
+    def _spawn(self):
+        conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, args=(child_conn, self.options), daemon=True)
+        proc.start()
+        child_conn.close()
+        return {'proc': proc, 'conn': conn, 'ready': False, 'seq': None}
+
+    def _allocate(self, size):
+        for shm in self.slots:
+            shm.close()
+            shm.unlink()
+        self.slots = [shared_memory.SharedMemory(create=True, size=size) for _ in range(self.workers)]
+        self.slot_size = size
+
+    def _idle(self):
+        # A worker still loading its model gets no frame, task_timeout only counts inference
+        return [i for i, w in enumerate(self.procs) if w['ready'] and w['seq'] is None and w['conn'] is not None]
+
+    def wait_started(self, timeout=60.0):
+        """Block until every worker has loaded its model, returns False on timeout"""
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: all(w['ready'] for w in self.procs if w['conn'] is not None), timeout)
+
+    def wait_ready(self, timeout=1.0):
+        """Block until a worker is free, returns False on timeout"""
+        with self.cond:
+            if self.cond.wait_for(lambda: self._idle() or not self.slots, timeout):
+                return True
+        # Don't wait forever on workers that are all gone
+        return not self.alive()
+
+    def alive(self):
+        return any(w['proc'].is_alive() for w in self.procs)
+
+    def submit(self, seq, frame):
+        """Copy a BGR frame into an idle worker's slot and send it, returns False if none is idle"""
+        if not self.alive():
+            raise RuntimeError("Inference workers are not running")
+        with self.cond:
+            if not self.slots:
+                self._allocate(frame.nbytes)
+            if frame.nbytes > self.slot_size:
+                if len(self.pending):
+                    # Frame size grew, wait for the slots to drain before reallocating
+                    self.frames_oversized += 1
+                    return False
+                self._allocate(frame.nbytes)
+            idle = self._idle()
+            if not idle:
+                return False
+            i = idle[0]
+            worker, shm = self.procs[i], self.slots[i]
+            worker['seq'] = seq
+            self.pending[seq] = (frame.shape, i, time.time())
+            self.frames_submitted += 1
+        with metrics.timer('shm_copy'):
+            np.copyto(np.ndarray(frame.shape, dtype=np.uint8, buffer=shm.buf), frame)
+        try:
+            worker['conn'].send((seq, shm.name, frame.shape))
+        except (OSError, AttributeError):
+            # The worker died in the meantime, the collector skips the frame
+            pass
+        return True
+
+    def _collect_loop(self):
+        while not self.closed:
+            conns = {w['conn']: i for i, w in enumerate(self.procs) if w['conn'] is not None}
+            if not conns:
+                break
+            for conn in wait(list(conns), timeout=1.0):
+                i = conns[conn]
+                try:
+                    kind, payload = conn.recv()
+                except (EOFError, OSError):
+                    if not self.closed:
+                        self._worker_died(i)
+                    continue
+                if kind == 'ready':
+                    with self.cond:
+                        self.procs[i]['ready'] = True
+                        self.failed_restarts = 0
+                        self.cond.notify_all()
+                    continue
+                seq, points, handedness, seconds = payload
+                metrics.observe('worker_inference', seconds)
+                with self.cond:
+                    self.procs[i]['seq'] = None
+                    self.busy_time += seconds
+                    if seq in self.pending:
+                        self.done[seq] = (points, handedness, seconds)
+                        if seq != min(self.pending):
+                            self.frames_reordered += 1
+                    self.cond.notify_all()
+            self._kill_stuck()
+            self._deliver()
+
+    def _deliver(self):
+        """Hand out everything that is now complete, oldest first"""
+        deliver = []
+        with self.cond:
+            while self.pending and min(self.pending) in self.done:
+                oldest = min(self.pending)
+                deliver.append((oldest, self.pending.pop(oldest)[0]) + self.done.pop(oldest))
+        for seq, shape, points, handedness, seconds in deliver:
+            self.frames_completed += 1
+            try:
+                self.on_result(seq, points, handedness, shape, seconds)
+            except Exception as e:
+                print(f"Inference result handler error: {e}")
+
+    def _kill_stuck(self):
+        now = time.time()
+        with self.cond:
+            stuck = [self.procs[i]['proc'] for seq, (_, i, submitted) in self.pending.items()
+                     if seq not in self.done and now - submitted > self.task_timeout]
+        for proc in stuck:
+            if proc.is_alive():
+                # Seen as a dead worker on the next round
+                print(f"Inference worker took over {self.task_timeout:.0f}s on a frame, killing it")
+                proc.kill()
+
+    def _worker_died(self, i):
+        worker = self.procs[i]
+        worker['proc'].join(timeout=1.0)
+        worker['conn'].close()
+        with self.cond:
+            seq = worker['seq']
+            if seq in self.pending:
+                # Its frame never gets a result, the later ones must not wait for it
+                del self.pending[seq]
+                self.frames_lost += 1
+                metrics.inc('inference_frames_lost_total')
+            if self.failed_restarts >= self.max_restarts:
+                print(f"Inference worker exited with code {worker['proc'].exitcode}, not restarting it")
+                worker.update(conn=None, ready=False, seq=None)
+            else:
+                print(f"Inference worker exited with code {worker['proc'].exitcode}, restarting it")
+                self.failed_restarts += 1
+                self.worker_restarts += 1
+                metrics.inc('worker_restarts_total')
+                self.procs[i] = self._spawn()
+            self.cond.notify_all()
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        self.closed = True
+        for w in self.procs:
+            try:
+                w['conn'].send(None)
+            except (OSError, AttributeError):
+                pass
+        for w in self.procs:
+            w['proc'].join(timeout=2.0)
+            if w['proc'].is_alive():
+                w['proc'].terminate()
+        with self.cond:
+            for shm in self.slots:
+                shm.close()
+                shm.unlink()
+            self.slots = []
+
+    def stats(self):
+        """Counters for the status endpoint"""
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            'workers': self.workers,
+            'workers_ready': sum(w['ready'] for w in self.procs),
+            'in_flight': len(self.pending),
+            'frames_submitted': self.frames_submitted,
+            'frames_completed': self.frames_completed,
+            'frames_reordered': self.frames_reordered,
+            'frames_oversized': self.frames_oversized,
+            'frames_lost': self.frames_lost,
+            'worker_restarts': self.worker_restarts,
+            'worker_utilization': round(self.busy_time / (elapsed * self.workers), 3) if elapsed else 0.0,
+        }